@@ -27,12 +27,25 @@ app.config['ALLOWED_EXTENSIONS'] = ALLOWED_EXTENSIONS
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 # Import routes
-from routes import upload, study_plan, chat
+from routes import upload, study_plan, chat, admin
 
 # Register blueprints
 app.register_blueprint(upload.bp)
 app.register_blueprint(study_plan.bp)
 app.register_blueprint(chat.bp)
+app.register_blueprint(admin.bp)
+
+# Install the request profiler (no-op unless PROFILING_ENABLED is set)
+from utils.profiling import init_profiling
+init_profiling(app)
+
+# Fingerprinted, precompressed static assets (built at startup when stale)
+from utils.assets import init_assets
+init_assets(app)
+
+# Start the background storage janitor (runs are shared across workers)
+from utils.storage import start_janitor
+start_janitor()
 
 @app.route('/')
 def index():
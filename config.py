@@ -11,9 +11,57 @@ load_dotenv()
 # Flask configuration
 SECRET_KEY = os.environ.get("SESSION_SECRET", "exam-pal-secret-key")
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
-MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")  # Admin endpoints are disabled when unset
+MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB per request
+MAX_UPLOAD_SIZE = 512 * 1024 * 1024  # 512MB per file via chunked uploads
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB chunks, well under MAX_CONTENT_LENGTH
 UPLOAD_FOLDER = 'uploads'
+EXTRACTED_FOLDER = 'extracted'  # Extracted text, one JSON record per upload
+PARTIAL_UPLOAD_FOLDER = 'partial_uploads'  # In-progress chunked uploads
+OCR_CACHE_FOLDER = 'ocr_cache'  # OCR text of scanned PDF pages, keyed by page hash
+ADMISSION_STATE_FOLDER = 'admission_state'  # Lock and state files shared by the gunicorn workers
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
 
+# Storage lifecycle (see utils/storage.py)
+DAY = 24 * 60 * 60
+JANITOR_INTERVAL = int(os.environ.get("JANITOR_INTERVAL", 15 * 60))  # Seconds between runs, 0 disables
+JANITOR_LOCK_FILE = os.path.join(ADMISSION_STATE_FOLDER, '.janitor.lock')
+STORAGE_GRACE_PERIOD = 10 * 60  # Never evict files touched more recently than this
+STORAGE_TTLS = {  # Seconds since last access
+    'uploads': 30 * DAY,
+    'ocr_cache': 14 * DAY,
+    'partial_uploads': 1 * DAY,
+    'admission_sessions': 1 * DAY
+}
+STORAGE_QUOTAS = {  # Bytes per namespace, least recently used files are evicted first
+    'uploads': 2 * 1024 * 1024 * 1024,
+    'ocr_cache': 100 * 1024 * 1024
+}
+
+# LLM admission control (see utils/admission.py)
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", 6))  # Across all workers; about Groq RPM x avg latency / 60
+LLM_SESSION_MAX_IN_FLIGHT = 2
+LLM_SESSION_RATE = 20 / 60  # Requests per second per session
+LLM_SESSION_BURST = 5
+LLM_CHAT_RESERVED = int(os.environ.get("LLM_CHAT_RESERVED", 2))  # Global slots only chat may use
+LLM_CLASS_MAX_IN_FLIGHT = {'plan': max(1, LLM_MAX_IN_FLIGHT - LLM_CHAT_RESERVED)}  # Across all workers
+LLM_CHAT_WAIT = 3  # Seconds chat may wait for a global slot; other classes never wait
+LLM_RETRY_AFTER = 5  # Seconds suggested to clients when the server is busy
+
+# Request profiling (see utils/profiling.py)
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "").lower() in ('1', 'true', 'yes')
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))  # Share of requests, 0 to 1
+PROFILE_FOLDER = 'profiles'
+PROFILE_KEEP = 50  # Per-request profiles kept
+
+# Static asset pipeline (see utils/assets.py)
+ASSET_DIST_FOLDER = os.path.join('static', 'dist')
+ASSETS_AUTO_BUILD = os.environ.get("ASSETS_AUTO_BUILD", "1").lower() in ('1', 'true', 'yes')  # Rebuild stale assets at startup
+ASSET_MAX_AGE = 365 * DAY  # Cache lifetime of fingerprinted assets
+
 # Create uploads folder if it doesn't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True) 
\ No newline at end of file
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(EXTRACTED_FOLDER, exist_ok=True)
+os.makedirs(PARTIAL_UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(OCR_CACHE_FOLDER, exist_ok=True)
+os.makedirs(os.path.join(ADMISSION_STATE_FOLDER, 'sessions'), exist_ok=True) 
\ No newline at end of file
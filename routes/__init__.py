@@ -2,4 +2,4 @@
 Route modules for Exam Pal application.
 """
 
-from routes import upload, study_plan, chat
\ No newline at end of file
+from routes import upload, study_plan, chat, admin
\ No newline at end of file
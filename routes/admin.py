@@ -0,0 +1,96 @@
+"""
+Route handlers for operator/admin functionality
+"""
+
+import os
+import hmac
+from functools import wraps
+
+from flask import Blueprint, request, jsonify, send_from_directory
+
+from config import ADMIN_TOKEN, PROFILE_FOLDER
+from utils.metrics import get_metrics
+from utils.storage import run_janitor
+from utils.profiling import list_profiles
+
+bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+def admin_required(view):
+    """Require the X-Admin-Token header to match ADMIN_TOKEN"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'success': False, 'message': 'Admin endpoints are disabled'}), 403
+
+        token = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(token, ADMIN_TOKEN):
+            return jsonify({'success': False, 'message': 'Invalid admin token'}), 403
+
+        return view(*args, **kwargs)
+    return wrapper
+
+@bp.route('/metrics', methods=['GET'])
+@admin_required
+def metrics():
+    """
+    Get the counters and timings of the worker that served this request
+
+    Returns:
+        JSON response with the metrics snapshot
+    """
+    return jsonify({
+        'success': True,
+        'metrics': get_metrics()
+    })
+
+@bp.route('/storage', methods=['GET', 'POST'])
+@admin_required
+def storage():
+    """
+    Report on storage usage, or run the janitor now
+
+    GET returns a dry-run report of what the janitor would remove;
+    POST runs it for real.
+
+    Returns:
+        JSON response with the janitor report
+    """
+    report = run_janitor(dry_run=request.method == 'GET')
+
+    return jsonify({
+        'success': True,
+        'report': report
+    })
+
+@bp.route('/profiles', methods=['GET'])
+@admin_required
+def profiles():
+    """
+    List saved request profiles, newest first
+
+    Aggregates are named <endpoint>.prof (pstats) and <endpoint>.folded
+    (collapsed stacks for flamegraph tools); single requests are under
+    requests/.
+
+    Returns:
+        JSON response with the list of profile files
+    """
+    return jsonify({
+        'success': True,
+        'profiles': list_profiles()
+    })
+
+@bp.route('/profiles/<path:name>', methods=['GET'])
+@admin_required
+def download_profile(name):
+    """
+    Download a saved profile file
+
+    Returns:
+        The profile file as an attachment
+    """
+    if not name.endswith(('.prof', '.folded')):
+        return jsonify({'success': False, 'message': 'Not a profile file'}), 404
+
+    # send_from_directory rejects paths that escape PROFILE_FOLDER
+    return send_from_directory(os.path.abspath(PROFILE_FOLDER), name, as_attachment=True)
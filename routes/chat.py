@@ -2,17 +2,23 @@
 Route handlers for chatbot functionality
 """
 
+import json
 import logging
 from typing import Dict, List, Any
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
 
-from utils.file_processor import get_all_uploaded_files, process_file
-from utils.groq_api import chat_with_materials, is_api_key_valid
+from utils.file_processor import get_corpus
+from utils.admission import admission_controlled
+from utils.groq_api import chat_with_materials, answer_questions_batch, is_api_key_valid
 
 bp = Blueprint('chat', __name__, url_prefix='/api')
 
+# Maximum number of questions accepted in one batch request
+MAX_BATCH_QUESTIONS = 50
+
 @bp.route('/chat', methods=['POST'])
+@admission_controlled('chat')
 def chat_message():
     """
     Handle chat messages and generate responses
@@ -56,25 +62,15 @@ def chat_message():
     if len(chat_history) > 20:
         chat_history = chat_history[-20:]
     
-    # Get the uploaded materials
-    uploaded_files = get_all_uploaded_files()
+    # Get the uploaded files; their extracted content is only read if the prompt isn't memoized
+    corpus_version, files, load_materials = get_corpus()
     
-    if not uploaded_files:
+    if not files:
         ai_response = "Arrey yaar! Mujhe koi study materials nahi mil rahe abhi tak. Apne notes, books, ya koi bhi resources upload karo jisme main tumhari help kar sakun! PDF ya images dono chalenge! 📚🔍"
     else:
-        # Process each file to get content if needed
-        materials = []
-        for file_info in uploaded_files:
-            # If we already have content, use it; otherwise process the file
-            if 'content' in file_info:
-                materials.append(file_info)
-            else:
-                processed_info = process_file(file_info['path'])
-                materials.append(processed_info)
-        
         try:
             # Generate response based on materials and chat history
-            ai_response = chat_with_materials(materials, user_message, chat_history)
+            ai_response = chat_with_materials(load_materials, user_message, chat_history, corpus_version)
         except Exception as e:
             logging.error(f"Error generating chat response: {str(e)}")
             ai_response = "Sorry, I'm having trouble processing your question right now. Please try again!"
@@ -94,6 +90,82 @@ def chat_message():
         'response': ai_response
     })
 
+@bp.route('/chat/batch', methods=['POST'])
+@admission_controlled('plan')
+def chat_batch():
+    """
+    Answer a list of practice questions against the uploaded materials
+
+    The materials context is assembled once and the questions are packed
+    into as few completion calls as the token budget allows.
+
+    Accepts:
+        - questions: List of question strings
+        - stream: If true, answers are sent as server-sent events as each
+          completion call finishes
+
+    Returns:
+        JSON response with one answer per question, or an event stream
+    """
+    # Check if API key is valid
+    if not is_api_key_valid():
+        return jsonify({
+            'success': False,
+            'message': 'Groq API key is not valid or not set',
+            'answers': None
+        }), 400
+
+    data = request.get_json()
+    questions = data.get('questions') if data else None
+
+    if not isinstance(questions, list):
+        return jsonify({
+            'success': False,
+            'message': 'No questions provided',
+            'answers': None
+        }), 400
+
+    questions = [str(q).strip() for q in questions if str(q).strip()]
+
+    if not questions or len(questions) > MAX_BATCH_QUESTIONS:
+        return jsonify({
+            'success': False,
+            'message': f'Provide between 1 and {MAX_BATCH_QUESTIONS} questions',
+            'answers': None
+        }), 400
+
+    corpus_version, files, load_materials = get_corpus()
+
+    if not files:
+        return jsonify({
+            'success': False,
+            'message': 'No study materials have been uploaded',
+            'answers': None
+        }), 400
+
+    batches = answer_questions_batch(load_materials, questions, corpus_version)
+
+    if data.get('stream'):
+        def generate():
+            for answers in batches:
+                for answer in answers:
+                    yield f"event: answer\ndata: {json.dumps(answer)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    answers = [answer for batch in batches for answer in batch]
+
+    return jsonify({
+        'success': True,
+        'message': f'Answered {len(answers)} question(s)',
+        'answers': answers
+    })
+
 @bp.route('/chat-history', methods=['GET'])
 def get_chat_history():
     """
@@ -2,17 +2,20 @@
 Route handlers for study plan generation
 """
 
+import json
 import logging
 from typing import Dict, Any
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 
-from utils.file_processor import get_all_uploaded_files, process_file
-from utils.groq_api import generate_study_plan, is_api_key_valid
+from utils.file_processor import get_corpus
+from utils.admission import admission_controlled
+from utils.groq_api import generate_study_plan, stream_study_plan, is_api_key_valid
 
 bp = Blueprint('study_plan', __name__, url_prefix='/api')
 
 @bp.route('/generate-plan', methods=['POST'])
+@admission_controlled('plan')
 def create_study_plan():
     """
     Generate a study plan based on uploaded materials
@@ -52,29 +55,19 @@ def create_study_plan():
             'plan': None
         }), 400
     
-    # Get the uploaded materials
-    uploaded_files = get_all_uploaded_files()
+    # Get the uploaded files; their extracted content is only read if the prompt isn't memoized
+    corpus_version, files, load_materials = get_corpus()
     
-    if not uploaded_files:
+    if not files:
         return jsonify({
             'success': False,
             'message': 'No study materials have been uploaded',
             'plan': None
         }), 400
     
-    # Process each file to get content
-    materials = []
-    for file_info in uploaded_files:
-        # If we already have content, use it; otherwise process the file
-        if 'content' in file_info:
-            materials.append(file_info)
-        else:
-            processed_info = process_file(file_info['path'])
-            materials.append(processed_info)
-    
     try:
         # Generate the study plan
-        study_plan = generate_study_plan(materials, goal, deadline)
+        study_plan = generate_study_plan(load_materials, goal, deadline, corpus_version)
         
         # Check if generation was successful
         if 'error' in study_plan:
@@ -97,3 +90,56 @@ def create_study_plan():
             'message': f'Error generating study plan: {str(e)}',
             'plan': None
         }), 500
+
+@bp.route('/generate-plan/stream', methods=['POST'])
+@admission_controlled('plan')
+def stream_plan():
+    """
+    Generate a study plan and stream it as server-sent events
+
+    Accepts:
+        - goal: Study goal (pass, good, ace, master)
+        - deadline: Date and time of the exam
+
+    Returns:
+        Event stream with 'overview' and 'milestone' events as each part
+        of the plan is complete, then 'done' with the full plan or 'error'
+    """
+    # Check if API key is valid
+    if not is_api_key_valid():
+        return jsonify({
+            'success': False,
+            'message': 'Groq API key is not valid or not set',
+            'plan': None
+        }), 400
+
+    data = request.get_json()
+
+    if not data or not data.get('deadline'):
+        return jsonify({
+            'success': False,
+            'message': 'No deadline provided',
+            'plan': None
+        }), 400
+
+    goal = data.get('goal', 'pass')
+    deadline = data['deadline']
+
+    corpus_version, files, load_materials = get_corpus()
+
+    if not files:
+        return jsonify({
+            'success': False,
+            'message': 'No study materials have been uploaded',
+            'plan': None
+        }), 400
+
+    def generate():
+        for event, value in stream_study_plan(load_materials, goal, deadline, corpus_version):
+            yield f"event: {event}\ndata: {json.dumps(value)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -3,16 +3,28 @@ Route handlers for file upload functionality
 """
 
 import os
+import gzip
+import json
 import logging
 from typing import List, Dict
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response
 from werkzeug.utils import secure_filename
 
-from utils.file_processor import save_uploaded_file, process_file, get_all_uploaded_files, delete_file
+from utils.file_processor import (
+    save_uploaded_file, process_file, get_all_uploaded_files, delete_file,
+    file_metadata, get_file_pages, join_pages
+)
+from utils.prompts import invalidate_sections
+from utils.chunked_upload import init_upload, get_upload_status, write_chunk, finalize_upload, abort_upload
+from config import UPLOAD_CHUNK_SIZE
 
 bp = Blueprint('upload', __name__, url_prefix='/api')
 
+def invalidate_corpus_caches():
+    """Drop this worker's memoized prompt sections after the corpus changes"""
+    invalidate_sections()
+
 @bp.route('/upload', methods=['POST'])
 def upload_files():
     """
@@ -22,7 +34,8 @@ def upload_files():
         - files: One or more files in the request
 
     Returns:
-        JSON response with upload status and file information
+        JSON response with upload status and file metadata (the extracted
+        text is served separately by /api/files/<file_id>/content)
     """
     # Check if any file was included in the request
     if 'files' not in request.files:
@@ -44,15 +57,18 @@ def upload_files():
             try:
                 # Process the file to extract content using Groq Vision for images
                 file_info = process_file(file_path)
-                uploaded_files.append(file_info)
+                uploaded_files.append(file_metadata(file_info))
                 logging.info(f"Successfully processed file: {file.filename}")
             except Exception as e:
                 logging.error(f"Error processing file {file.filename}: {str(e)}")
+                # Don't leave an orphaned upload behind
+                delete_file(file_path)
                 return jsonify({'success': False, 'message': f"Error processing file {file.filename}: {str(e)}"}), 500
         else:
             logging.warning(f"Failed to upload file {file.filename}: {message}")
 
     if uploaded_files:
+        invalidate_corpus_caches()
         return jsonify({
             'success': True,
             'message': f'Successfully uploaded {len(uploaded_files)} file(s)',
@@ -64,6 +80,129 @@ def upload_files():
             'message': 'No files were uploaded successfully'
         }), 400
 
+@bp.route('/uploads', methods=['POST'])
+def start_chunked_upload():
+    """
+    Start a chunked, resumable upload
+
+    Accepts:
+        - filename: Name of the file being uploaded
+        - size: Total size of the file in bytes
+
+    Returns:
+        JSON response with the upload id and the chunk size to use
+    """
+    data = request.get_json()
+
+    if not data or 'filename' not in data or 'size' not in data:
+        return jsonify({'success': False, 'message': 'Filename and size are required'}), 400
+
+    success, message, status = init_upload(data['filename'], data['size'])
+
+    if not success:
+        return jsonify({'success': False, 'message': message}), 400
+
+    return jsonify({
+        'success': True,
+        'message': message,
+        'chunk_size': UPLOAD_CHUNK_SIZE,
+        **status
+    })
+
+@bp.route('/uploads/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """
+    Get the progress of a chunked upload
+
+    Returns:
+        JSON response with the number of bytes received so far
+    """
+    status = get_upload_status(upload_id)
+
+    if status is None:
+        return jsonify({'success': False, 'message': 'Upload not found'}), 404
+
+    return jsonify({'success': True, 'chunk_size': UPLOAD_CHUNK_SIZE, **status})
+
+@bp.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """
+    Append one chunk to a chunked upload
+
+    Accepts:
+        - offset: Byte offset of the chunk (query string)
+        - Raw chunk bytes as the request body
+
+    Returns:
+        JSON response with the number of bytes received so far; 409 with
+        the current offset if the chunk does not start where expected
+    """
+    offset = request.args.get('offset', type=int)
+
+    if offset is None or offset < 0:
+        return jsonify({'success': False, 'message': 'Invalid offset'}), 400
+
+    # Read from the raw stream so the chunk is never buffered in memory
+    success, message, status = write_chunk(upload_id, offset, request.stream)
+
+    if status is None:
+        return jsonify({'success': False, 'message': message}), 404
+
+    if not success:
+        code = 409 if status['received'] != offset else 400
+        return jsonify({'success': False, 'message': message, **status}), code
+
+    return jsonify({'success': True, 'message': message, **status})
+
+@bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    """
+    Finish a chunked upload and extract its content
+
+    Accepts:
+        - sha256: Optional checksum of the whole file to verify
+
+    Returns:
+        JSON response with the uploaded file's metadata
+    """
+    data = request.get_json(silent=True) or {}
+
+    success, message, file_path, digest = finalize_upload(upload_id, data.get('sha256'))
+
+    if not success:
+        code = 404 if message == 'Upload not found' else 400
+        return jsonify({'success': False, 'message': message}), code
+
+    try:
+        file_info = process_file(file_path, sha256=digest)
+        logging.info(f"Successfully processed file: {file_info['name']}")
+    except Exception as e:
+        logging.error(f"Error processing file {file_path}: {str(e)}")
+        # Don't leave an orphaned upload behind
+        delete_file(file_path)
+        return jsonify({'success': False, 'message': f"Error processing file: {str(e)}"}), 500
+
+    invalidate_corpus_caches()
+
+    return jsonify({
+        'success': True,
+        'message': message,
+        'file': file_metadata(file_info)
+    })
+
+@bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def cancel_chunked_upload(upload_id):
+    """
+    Cancel a chunked upload and discard its partial data
+
+    Returns:
+        JSON response with cancellation status
+    """
+    if not abort_upload(upload_id):
+        return jsonify({'success': False, 'message': 'Upload not found'}), 404
+
+    return jsonify({'success': True, 'message': 'Upload cancelled'})
+
 @bp.route('/files', methods=['GET'])
 def get_files():
     """
@@ -107,7 +246,78 @@ def delete_uploaded_file():
 
     success, message = delete_file(filename)
 
+    if success:
+        invalidate_corpus_caches()
+
     return jsonify({
         'success': success,
         'message': message
     })
+
+@bp.route('/files/<file_id>/content', methods=['GET'])
+def get_file_content(file_id):
+    """
+    Get the extracted text of an uploaded file
+
+    Accepts (query string, all optional):
+        - page_start: First page to return (1-based, inclusive)
+        - page_end: Last page to return (1-based, inclusive)
+        - offset: Character offset into the selected text
+        - length: Maximum number of characters to return
+
+    Returns:
+        JSON response with the requested slice of content, gzip-encoded
+        when the client accepts it
+    """
+    # Validate the file id to prevent directory traversal
+    if secure_filename(file_id) != file_id:
+        return jsonify({'success': False, 'message': 'Invalid file id'}), 400
+
+    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], file_id)
+    if not os.path.isfile(file_path):
+        return jsonify({'success': False, 'message': 'File not found'}), 404
+
+    # request.args.get(type=int) silently falls back to the default on bad
+    # input, so convert the raw values and reject anything malformed
+    try:
+        page_start = int(request.args.get('page_start', 1))
+        page_end = int(request.args['page_end']) if 'page_end' in request.args else None
+        offset = int(request.args.get('offset', 0))
+        length = int(request.args['length']) if 'length' in request.args else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid range parameters'}), 400
+
+    pages = get_file_pages(file_path)
+    total_pages = len(pages)
+
+    if page_end is None or page_end > total_pages:
+        page_end = total_pages
+    if page_start < 1 or offset < 0 or (length is not None and length < 0):
+        return jsonify({'success': False, 'message': 'Invalid range parameters'}), 400
+
+    content = join_pages(pages[page_start - 1:page_end])
+    total_chars = len(content)
+    end = total_chars if length is None else offset + length
+    content = content[offset:end]
+
+    body = json.dumps({
+        'success': True,
+        'id': file_id,
+        'total_pages': total_pages,
+        'page_start': page_start,
+        'page_end': page_end,
+        'offset': offset,
+        'length': len(content),
+        'total_chars': total_chars,
+        'content': content
+    }).encode('utf-8')
+
+    response = Response(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+
+    # Extracted text compresses very well, so gzip anything non-trivial
+    if 'gzip' in request.accept_encodings and len(body) > 1024:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+
+    return response
@@ -67,12 +67,33 @@ function handleFiles(files) {
         return;
     }
     
+    // Large files go through the chunked, resumable protocol
+    const smallFiles = validFiles.filter(file => file.size <= CHUNKED_UPLOAD_THRESHOLD);
+    const largeFiles = validFiles.filter(file => file.size > CHUNKED_UPLOAD_THRESHOLD);
+    
+    if (smallFiles.length > 0) {
+        uploadFilesMultipart(smallFiles);
+    }
+    
+    largeFiles.forEach(file => {
+        uploadFileChunked(file)
+        .then(fileInfo => {
+            addUploadedFiles([fileInfo]);
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            showToast(`Upload of "${file.name}" failed: ${error.message}`, 'error');
+        });
+    });
+}
+
+function uploadFilesMultipart(files) {
     // Show loading state
-    showToast(`Uploading ${validFiles.length} file(s)...`, 'info');
+    showToast(`Uploading ${files.length} file(s)...`, 'info');
     
     // Prepare form data
     const formData = new FormData();
-    validFiles.forEach(file => {
+    files.forEach(file => {
         formData.append('files', file);
     });
     
@@ -91,18 +112,7 @@ function handleFiles(files) {
         if (data.success) {
             // Add uploaded files to our list
             if (data.files && data.files.length > 0) {
-                uploadedFiles = uploadedFiles.concat(data.files);
-                
-                // Update the preview
-                updateFilePreview();
-                
-                // Show success message
-                showToast(`${data.files.length} file(s) uploaded successfully!`, 'success');
-                
-                // Dispatch event that files were uploaded
-                document.dispatchEvent(new CustomEvent('filesUploaded', { 
-                    detail: uploadedFiles
-                }));
+                addUploadedFiles(data.files);
             }
         } else {
             showToast(data.message || 'Failed to upload files', 'error');
@@ -114,6 +124,136 @@ function handleFiles(files) {
     });
 }
 
+function addUploadedFiles(files) {
+    uploadedFiles = uploadedFiles.concat(files);
+    
+    // Update the preview
+    updateFilePreview();
+    
+    // Show success message
+    showToast(`${files.length} file(s) uploaded successfully!`, 'success');
+    
+    // Dispatch event that files were uploaded
+    document.dispatchEvent(new CustomEvent('filesUploaded', { 
+        detail: uploadedFiles
+    }));
+}
+
+// Chunked, resumable uploads for large files
+
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const CHUNK_MAX_RETRIES = 5;
+
+function chunkedUploadKey(file) {
+    return `chunked-upload:${file.name}:${file.size}:${file.lastModified}`;
+}
+
+async function fetchJSON(url, options = {}) {
+    const response = await fetch(url, options);
+    const data = await response.json().catch(() => ({}));
+    return { status: response.status, ok: response.ok, data: data };
+}
+
+async function startOrResumeUpload(file) {
+    const key = chunkedUploadKey(file);
+    const savedId = localStorage.getItem(key);
+    
+    // Resume a previous attempt of the same file if the server still has it
+    if (savedId) {
+        const result = await fetchJSON(`/api/uploads/${savedId}`);
+        if (result.ok && result.data.success) {
+            return result.data;
+        }
+        localStorage.removeItem(key);
+    }
+    
+    const result = await fetchJSON('/api/uploads', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            filename: file.name,
+            size: file.size
+        })
+    });
+    
+    if (!result.ok || !result.data.success) {
+        throw new Error(result.data.message || `HTTP error! Status: ${result.status}`);
+    }
+    
+    localStorage.setItem(key, result.data.upload_id);
+    return result.data;
+}
+
+async function uploadFileChunked(file) {
+    const upload = await startOrResumeUpload(file);
+    const uploadId = upload.upload_id;
+    const chunkSize = upload.chunk_size;
+    let offset = upload.received;
+    let retries = 0;
+    
+    if (offset > 0) {
+        showToast(`Resuming "${file.name}" at ${Math.round(offset * 100 / file.size)}%...`, 'info');
+    } else {
+        showToast(`Uploading "${file.name}"...`, 'info');
+    }
+    
+    while (offset < file.size) {
+        const chunk = file.slice(offset, Math.min(offset + chunkSize, file.size));
+        
+        try {
+            const result = await fetchJSON(`/api/uploads/${uploadId}?offset=${offset}`, {
+                method: 'PUT',
+                headers: {
+                    'Content-Type': 'application/octet-stream',
+                },
+                body: chunk
+            });
+            
+            if (result.ok || result.status === 409) {
+                // On 409 the server tells us where to continue from
+                offset = result.data.received;
+                retries = 0;
+                continue;
+            }
+            
+            if (result.status === 404) {
+                localStorage.removeItem(chunkedUploadKey(file));
+                throw new Error('Upload expired on the server');
+            }
+            
+            throw new Error(result.data.message || `HTTP error! Status: ${result.status}`);
+        } catch (error) {
+            if (error.message === 'Upload expired on the server' || ++retries > CHUNK_MAX_RETRIES) {
+                throw error;
+            }
+            
+            // Back off, then ask the server how much it actually received
+            await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** retries));
+            const status = await fetchJSON(`/api/uploads/${uploadId}`).catch(() => null);
+            if (status && status.ok) {
+                offset = status.data.received;
+            }
+        }
+    }
+    
+    const result = await fetchJSON(`/api/uploads/${uploadId}/finalize`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({})
+    });
+    
+    if (!result.ok || !result.data.success) {
+        throw new Error(result.data.message || `HTTP error! Status: ${result.status}`);
+    }
+    
+    localStorage.removeItem(chunkedUploadKey(file));
+    return result.data.file;
+}
+
 function updateFilePreview() {
     const filePreview = document.getElementById('file-preview');
     if (!filePreview) return;
@@ -137,6 +277,7 @@ function updateFilePreview() {
         fileItem.innerHTML = `
             <i class="${icon}"></i>
             <span>${file.name}</span>
+            <span class="preview-file" data-index="${index}" title="Preview extracted text"><i class="fas fa-eye"></i></span>
             <span class="remove-file" data-index="${index}">×</span>
         `;
         
@@ -152,6 +293,15 @@ function updateFilePreview() {
         });
     });
     
+    // Add preview event listeners
+    document.querySelectorAll('.preview-file').forEach(button => {
+        button.addEventListener('click', function(e) {
+            e.stopPropagation();
+            const index = parseInt(this.getAttribute('data-index'));
+            previewFile(index);
+        });
+    });
+    
     // Show empty state if no files
     if (uploadedFiles.length === 0) {
         filePreview.innerHTML = '<div class="empty-state">No files uploaded yet</div>';
@@ -200,6 +350,69 @@ function removeFile(index) {
     }
 }
 
+// Number of pages fetched per preview request
+const PREVIEW_PAGE_COUNT = 2;
+
+function previewFile(index, pageStart = 1) {
+    if (index < 0 || index >= uploadedFiles.length) return;
+    
+    const file = uploadedFiles[index];
+    const pageEnd = pageStart + PREVIEW_PAGE_COUNT - 1;
+    
+    // Extracted text is only fetched when a preview is opened
+    fetch(`/api/files/${encodeURIComponent(file.id)}/content?page_start=${pageStart}&page_end=${pageEnd}`)
+    .then(response => {
+        if (!response.ok) {
+            throw new Error(`HTTP error! Status: ${response.status}`);
+        }
+        return response.json();
+    })
+    .then(data => {
+        if (data.success) {
+            showFilePreview(index, file, data);
+        } else {
+            showToast(data.message || 'Failed to load preview', 'error');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        showToast('An error occurred while loading the preview', 'error');
+    });
+}
+
+function showFilePreview(index, file, data) {
+    let previewPanel = document.getElementById('file-content-preview');
+    if (!previewPanel) {
+        previewPanel = document.createElement('div');
+        previewPanel.id = 'file-content-preview';
+        previewPanel.className = 'file-content-preview';
+        document.getElementById('file-preview').after(previewPanel);
+    }
+    
+    const hasMore = data.page_end < data.total_pages;
+    
+    previewPanel.innerHTML = `
+        <div class="file-content-preview-header">
+            <strong>${file.name}</strong>
+            <span class="text-muted">Pages ${data.page_start}-${data.page_end} of ${data.total_pages}</span>
+            <span class="close-preview">×</span>
+        </div>
+        <pre class="file-content-preview-text"></pre>
+        ${hasMore ? '<button class="btn btn-secondary load-more-preview">Next pages</button>' : ''}
+    `;
+    previewPanel.querySelector('.file-content-preview-text').textContent = data.content;
+    
+    previewPanel.querySelector('.close-preview').addEventListener('click', () => {
+        previewPanel.remove();
+    });
+    
+    if (hasMore) {
+        previewPanel.querySelector('.load-more-preview').addEventListener('click', () => {
+            previewFile(index, data.page_end + 1);
+        });
+    }
+}
+
 function getUploadedFiles() {
     return uploadedFiles;
 }
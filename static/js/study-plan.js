@@ -47,6 +47,15 @@ function initializeStudyPlanForm() {
 }
 
 function generateStudyPlan(studyGoal, deadline) {
+    // Stream the plan when the browser supports reading response bodies
+    if (window.ReadableStream && window.TextDecoder) {
+        streamStudyPlan(studyGoal, deadline);
+    } else {
+        fetchStudyPlan(studyGoal, deadline);
+    }
+}
+
+function fetchStudyPlan(studyGoal, deadline) {
     fetch('/api/generate-plan', {
         method: 'POST',
         headers: {
@@ -64,44 +73,159 @@ function generateStudyPlan(studyGoal, deadline) {
         return response.json();
     })
     .then(data => {
-        // Hide loading state
-        const studyPlanLoading = document.getElementById('study-plan-loading');
-        const studyPlanResults = document.getElementById('study-plan-results');
+        showStudyPlanResults();
         
-        if (studyPlanLoading) {
-            studyPlanLoading.classList.add('hidden');
+        // Display study plan
+        displayStudyPlan(data.plan);
+        
+        studyPlanReady(data.plan);
+    })
+    .catch(studyPlanFailed);
+}
+
+async function streamStudyPlan(studyGoal, deadline) {
+    let started = false;
+    let finished = false;
+    let fallback = true;
+    
+    const handleEvent = (rawEvent) => {
+        const event = parseServerSentEvent(rawEvent);
+        if (!event) return;
+        
+        if (event.type === 'error') {
+            // The server tried and failed; asking again won't help
+            fallback = false;
+            throw new Error(event.data);
         }
         
-        if (studyPlanResults) {
-            studyPlanResults.classList.remove('hidden');
+        if (!started) {
+            showStudyPlanResults();
+            startStudyPlan();
+            started = true;
         }
         
-        // Display study plan
-        displayStudyPlan(data.plan);
+        if (event.type === 'overview') {
+            renderPlanOverview(event.data);
+        } else if (event.type === 'milestone') {
+            appendMilestone(event.data);
+        } else if (event.type === 'done') {
+            // Re-render from the full plan in case anything was not streamed
+            displayStudyPlan(event.data);
+            studyPlanReady(event.data);
+            finished = true;
+        }
+    };
+    
+    try {
+        const response = await fetch('/api/generate-plan/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                goal: studyGoal,
+                deadline: deadline
+            })
+        });
+        
+        if (!response.ok) {
+            // Only fall back when the stream endpoint itself is unavailable;
+            // bad input or a busy server would fail the same way again
+            fallback = [404, 405].includes(response.status) || response.status >= 500;
+            throw new Error(`HTTP error! Status: ${response.status}`);
+        }
         
-        // Show success message
-        showToast('Your personalized study plan is ready!', 'success');
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
         
-        // Trigger event that plan is ready for other components to use
-        document.dispatchEvent(new CustomEvent('studyPlanGenerated', {
-            detail: data.plan
-        }));
-    })
-    .catch(error => {
-        console.error('Error:', error);
+        // Server-sent events are separated by a blank line
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            events.forEach(handleEvent);
+        }
         
-        // Hide loading state
-        const studyPlanLoading = document.getElementById('study-plan-loading');
-        if (studyPlanLoading) {
-            studyPlanLoading.classList.add('hidden');
+        // The last event may not be followed by a blank line
+        buffer += decoder.decode();
+        if (buffer.trim()) {
+            handleEvent(buffer);
         }
         
-        // Show error message
-        showToast('Failed to generate study plan. Please try again.', 'error');
+        if (!finished) {
+            throw new Error('Study plan stream ended before the plan was complete');
+        }
+    } catch (error) {
+        if (!started && fallback) {
+            // Nothing arrived from the stream; try the non-streaming endpoint
+            console.warn('Streaming study plan failed, falling back:', error);
+            fetchStudyPlan(studyGoal, deadline);
+        } else if (started && !finished) {
+            studyPlanFailed(error, 'The study plan was cut off. The milestones above are incomplete; please try again.');
+        } else {
+            studyPlanFailed(error);
+        }
+    }
+}
+
+function parseServerSentEvent(rawEvent) {
+    let type = 'message';
+    let data = '';
+    
+    rawEvent.split('\n').forEach(line => {
+        if (line.startsWith('event: ')) {
+            type = line.slice(7);
+        } else if (line.startsWith('data: ')) {
+            data += line.slice(6);
+        }
     });
+    
+    if (!data) return null;
+    return { type: type, data: JSON.parse(data) };
 }
 
-function displayStudyPlan(plan) {
+function showStudyPlanResults() {
+    // Hide loading state
+    const studyPlanLoading = document.getElementById('study-plan-loading');
+    const studyPlanResults = document.getElementById('study-plan-results');
+    
+    if (studyPlanLoading) {
+        studyPlanLoading.classList.add('hidden');
+    }
+    
+    if (studyPlanResults) {
+        studyPlanResults.classList.remove('hidden');
+    }
+}
+
+function studyPlanReady(plan) {
+    // Show success message
+    showToast('Your personalized study plan is ready!', 'success');
+    
+    // Trigger event that plan is ready for other components to use
+    document.dispatchEvent(new CustomEvent('studyPlanGenerated', {
+        detail: plan
+    }));
+}
+
+function studyPlanFailed(error, message) {
+    console.error('Error:', error);
+    
+    // Hide loading state
+    const studyPlanLoading = document.getElementById('study-plan-loading');
+    if (studyPlanLoading) {
+        studyPlanLoading.classList.add('hidden');
+    }
+    
+    // Show error message
+    showToast(message || 'Failed to generate study plan. Please try again.', 'error');
+}
+
+function startStudyPlan() {
     const studyPlanResults = document.getElementById('study-plan-results');
     if (!studyPlanResults) return;
     
@@ -116,57 +240,78 @@ function displayStudyPlan(plan) {
     `;
     studyPlanResults.appendChild(header);
     
-    // Add overview section if it exists
-    if (plan.overview) {
-        const overview = document.createElement('div');
-        overview.className = 'plan-overview mb-3';
-        overview.innerHTML = `
-            <h4>Overview</h4>
-            <p>${plan.overview}</p>
-        `;
-        studyPlanResults.appendChild(overview);
-    }
+    // Overview goes above the milestones once it arrives
+    const overview = document.createElement('div');
+    overview.className = 'plan-overview mb-3 hidden';
+    studyPlanResults.appendChild(overview);
     
     // Add milestones section
     const milestonesContainer = document.createElement('div');
     milestonesContainer.className = 'milestones';
+    studyPlanResults.appendChild(milestonesContainer);
+}
+
+function renderPlanOverview(text) {
+    const overview = document.querySelector('#study-plan-results .plan-overview');
+    if (!overview) return;
     
-    if (plan.milestones && plan.milestones.length > 0) {
-        plan.milestones.forEach(milestone => {
-            const milestoneElement = document.createElement('div');
-            milestoneElement.className = 'milestone';
-            
-            let tasksHTML = '';
-            if (milestone.tasks && milestone.tasks.length > 0) {
-                tasksHTML = '<ul class="tasks">';
-                milestone.tasks.forEach(task => {
-                    tasksHTML += `<li class="task"><i class="fas fa-check-circle"></i> ${task}</li>`;
-                });
-                tasksHTML += '</ul>';
-            }
-            
-            // Check if there's a unit property in the milestone
-            const unitHTML = milestone.unit ? `<div class="milestone-unit"><span class="unit-label">Unit:</span> ${milestone.unit}</div>` : '';
-            
-            milestoneElement.innerHTML = `
-                <div class="milestone-date">${formatDate(milestone.date)}</div>
-                <h4>${milestone.title}</h4>
-                ${unitHTML}
-                <p>${milestone.description || ''}</p>
-                ${tasksHTML}
-            `;
-            
-            milestonesContainer.appendChild(milestoneElement);
+    overview.innerHTML = `
+        <h4>Overview</h4>
+        <p>${text}</p>
+    `;
+    overview.classList.remove('hidden');
+}
+
+function appendMilestone(milestone) {
+    const milestonesContainer = document.querySelector('#study-plan-results .milestones');
+    if (!milestonesContainer) return;
+    
+    const milestoneElement = document.createElement('div');
+    milestoneElement.className = 'milestone';
+    
+    let tasksHTML = '';
+    if (milestone.tasks && milestone.tasks.length > 0) {
+        tasksHTML = '<ul class="tasks">';
+        milestone.tasks.forEach(task => {
+            tasksHTML += `<li class="task"><i class="fas fa-check-circle"></i> ${task}</li>`;
         });
+        tasksHTML += '</ul>';
+    }
+    
+    // Check if there's a unit property in the milestone
+    const unitHTML = milestone.unit ? `<div class="milestone-unit"><span class="unit-label">Unit:</span> ${milestone.unit}</div>` : '';
+    
+    milestoneElement.innerHTML = `
+        <div class="milestone-date">${formatDate(milestone.date)}</div>
+        <h4>${milestone.title}</h4>
+        ${unitHTML}
+        <p>${milestone.description || ''}</p>
+        ${tasksHTML}
+    `;
+    
+    milestonesContainer.appendChild(milestoneElement);
+}
+
+function displayStudyPlan(plan) {
+    const studyPlanResults = document.getElementById('study-plan-results');
+    if (!studyPlanResults) return;
+    
+    startStudyPlan();
+    
+    // Add overview section if it exists
+    if (plan.overview) {
+        renderPlanOverview(plan.overview);
+    }
+    
+    if (plan.milestones && plan.milestones.length > 0) {
+        plan.milestones.forEach(appendMilestone);
     } else {
         // Fallback if milestones aren't structured as expected
         const planContent = document.createElement('div');
         planContent.innerHTML = typeof plan === 'string' ? plan : JSON.stringify(plan);
-        milestonesContainer.appendChild(planContent);
+        studyPlanResults.querySelector('.milestones').appendChild(planContent);
     }
     
-    studyPlanResults.appendChild(milestonesContainer);
-    
     // Add print/export button
     const actionsContainer = document.createElement('div');
     actionsContainer.className = 'actions mt-3';
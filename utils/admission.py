@@ -0,0 +1,242 @@
+"""
+Admission control for the LLM endpoints of Exam Pal
+Limits Groq calls per session and globally, reserves capacity for chat so
+plan and batch bursts can't starve it, and sheds load with a fast 429
+instead of holding gunicorn threads in long queues
+
+State is shared across gunicorn workers through the filesystem:
+    - the global in-flight cap and the per-class caps are sets of slot
+      files held with flock, so a crashed worker's slots are released by
+      the OS
+    - per-session rate and concurrency state is a small JSON file per
+      session, updated under flock
+"""
+
+import os
+import json
+import math
+import time
+import uuid
+import fcntl
+import hashlib
+from functools import wraps
+from typing import List, Optional
+
+from flask import jsonify, make_response, session
+
+from config import (
+    ADMISSION_STATE_FOLDER, LLM_MAX_IN_FLIGHT, LLM_SESSION_MAX_IN_FLIGHT, LLM_SESSION_RATE,
+    LLM_SESSION_BURST, LLM_CLASS_MAX_IN_FLIGHT, LLM_CHAT_WAIT, LLM_RETRY_AFTER
+)
+from utils.metrics import increment, record_timing
+
+# Request classes; only chat waits for a slot, everything else is shed when busy
+KINDS = ('chat', 'plan')
+
+# How often a waiting chat request re-checks for a free slot
+POLL_INTERVAL = 0.05
+
+# Session in-flight entries older than this are from crashed requests
+STALE_IN_FLIGHT = 150
+
+SESSIONS_FOLDER = os.path.join(ADMISSION_STATE_FOLDER, 'sessions')
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of admitted"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+class Ticket:
+    """An admitted request: its slots and its session entry"""
+
+    def __init__(self, session_id: str, kind: str):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.kind = kind
+        self.slot_files: List = []
+        self.released = False
+
+class AdmissionController:
+    """Per-session limits, a global in-flight cap and per-class caps"""
+
+    def __init__(self, max_in_flight: int = LLM_MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+
+    # Session state
+
+    def _session_path(self, session_id: str) -> str:
+        digest = hashlib.sha1(session_id.encode('utf-8')).hexdigest()
+        return os.path.join(SESSIONS_FOLDER, f"{digest}.json")
+
+    def _update_session(self, session_id: str, update) -> None:
+        """Read-modify-write a session's state under an exclusive lock"""
+        with open(self._session_path(session_id), 'a+') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or '{}')
+            except ValueError:
+                state = {}
+
+            update(state)
+
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(state))
+
+    def _admit_session(self, ticket: Ticket) -> None:
+        """Apply the session's rate limit and concurrency limit"""
+        def update(state):
+            now = time.time()
+            in_flight = [entry for entry in state.get('in_flight', []) if now - entry[1] < STALE_IN_FLIGHT]
+
+            if len(in_flight) >= LLM_SESSION_MAX_IN_FLIGHT:
+                raise AdmissionRejected("Too many requests in progress, please wait for one to finish", 1)
+
+            # Token bucket refill
+            tokens = state.get('tokens', LLM_SESSION_BURST)
+            tokens = min(LLM_SESSION_BURST, tokens + (now - state.get('updated', now)) * LLM_SESSION_RATE)
+            if tokens < 1:
+                raise AdmissionRejected("You're sending requests too quickly, please slow down",
+                                        (1 - tokens) / LLM_SESSION_RATE)
+
+            in_flight.append([ticket.id, now])
+            state.update({'tokens': tokens - 1, 'updated': now, 'in_flight': in_flight})
+
+        self._update_session(ticket.session_id, update)
+
+    def _release_session(self, ticket: Ticket) -> None:
+        def update(state):
+            state['in_flight'] = [entry for entry in state.get('in_flight', []) if entry[0] != ticket.id]
+
+        self._update_session(ticket.session_id, update)
+
+    # Slots
+
+    def _try_take_slot(self, prefix: str, count: int) -> Optional[object]:
+        """Take a free slot from a pool of count slot files, or None if all are held"""
+        for i in range(count):
+            slot_file = open(os.path.join(ADMISSION_STATE_FOLDER, f"{prefix}-{i}.lock"), 'a')
+            try:
+                fcntl.flock(slot_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot_file
+            except BlockingIOError:
+                slot_file.close()
+        return None
+
+    def _take_slots(self, ticket: Ticket) -> None:
+        """
+        Take the request's class slot and a global slot, or shed it
+
+        Classes with a cap below LLM_MAX_IN_FLIGHT leave the remaining
+        global slots to chat. Only chat waits (briefly) for a global slot;
+        other classes get an immediate 429 rather than holding a thread.
+        """
+        kind = ticket.kind
+        busy = AdmissionRejected("Server is busy, please try again shortly", LLM_RETRY_AFTER)
+
+        cap = LLM_CLASS_MAX_IN_FLIGHT.get(kind)
+        if cap is not None:
+            slot_file = self._try_take_slot(f"{kind}-slot", cap)
+            if slot_file is None:
+                increment(f'admission.{kind}.shed')
+                raise busy
+            ticket.slot_files.append(slot_file)
+
+        deadline = time.monotonic() + (LLM_CHAT_WAIT if kind == 'chat' else 0)
+        while True:
+            slot_file = self._try_take_slot('slot', self.max_in_flight)
+            if slot_file is not None:
+                ticket.slot_files.append(slot_file)
+                return
+            if time.monotonic() >= deadline:
+                increment(f'admission.{kind}.shed')
+                raise busy
+            time.sleep(POLL_INTERVAL)
+
+    def _release_slots(self, ticket: Ticket) -> None:
+        for slot_file in ticket.slot_files:
+            fcntl.flock(slot_file.fileno(), fcntl.LOCK_UN)
+            slot_file.close()
+        ticket.slot_files = []
+
+    # Public API
+
+    def acquire(self, session_id: str, kind: str) -> Ticket:
+        """
+        Admit a request or raise AdmissionRejected
+
+        Args:
+            session_id: Identifier of the requesting session
+            kind: Request class: 'chat' or 'plan'
+
+        Returns:
+            Ticket to pass to release()
+        """
+        ticket = Ticket(session_id, kind)
+        start = time.monotonic()
+
+        self._admit_session(ticket)
+        try:
+            self._take_slots(ticket)
+        except AdmissionRejected:
+            self._release_slots(ticket)
+            self._release_session(ticket)
+            raise
+
+        record_timing(f'admission.{kind}.wait', time.monotonic() - start)
+        increment(f'admission.{kind}.admitted')
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        """Return a ticket's slots and session entry"""
+        if ticket.released:
+            return
+        ticket.released = True
+
+        self._release_slots(ticket)
+        self._release_session(ticket)
+
+controller = AdmissionController()
+
+def _rejected_response(error: AdmissionRejected):
+    """Fast 429 with a Retry-After hint"""
+    response = jsonify({'success': False, 'message': error.message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+    return response
+
+def admission_controlled(kind: str):
+    """
+    Decorate an LLM route so it is admitted before doing any work
+
+    The slots are held until the response is closed, so streamed responses
+    keep them while streaming. LLM calls made while the view runs (such as
+    the API key check) count against the request's own slot.
+
+    Args:
+        kind: Request class: 'chat' or 'plan'
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            session_id = session.setdefault('admission_id', uuid.uuid4().hex)
+
+            try:
+                ticket = controller.acquire(session_id, kind)
+            except AdmissionRejected as e:
+                return _rejected_response(e)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                controller.release(ticket)
+                raise
+
+            response.call_on_close(lambda: controller.release(ticket))
+            return response
+        return wrapper
+    return decorator
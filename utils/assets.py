@@ -0,0 +1,419 @@
+"""
+Static asset pipeline for Exam Pal
+Builds content-hashed, minified and precompressed copies of the JS/CSS and
+icon into ASSET_DIST_FOLDER, and serves them with immutable cache headers so
+browsers stop revalidating assets on every page load
+
+Templates link assets with asset_url('js/app.js'), which resolves through
+the build manifest and falls back to the plain static URL when no build
+exists. Build from the command line with:
+    python -m utils.assets
+"""
+
+import os
+import re
+import sys
+import json
+import gzip
+import fcntl
+import hashlib
+import logging
+import mimetypes
+import argparse
+from typing import Dict, List, Optional
+
+from flask import request, send_from_directory, url_for, abort
+
+from config import ASSET_DIST_FOLDER, ASSETS_AUTO_BUILD, ASSET_MAX_AGE
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are optional; gzip is always built
+    brotli = None
+
+STATIC_FOLDER = 'static'
+
+# Assets kept outside static/, by public name
+EXTRA_ASSETS = {'generated-icon.png': 'generated-icon.png'}
+
+# Extensions that are precompressed; everything else is only copied
+COMPRESSIBLE = ('.js', '.css', '.svg', '.json', '.txt')
+
+# Smaller files gain nothing from compression
+MIN_COMPRESS_SIZE = 512
+
+MANIFEST_NAME = 'manifest.json'
+
+def _skip_string(source: str, i: int) -> int:
+    """Index just past the quoted string starting at i"""
+    quote = source[i]
+    i += 1
+    while i < len(source) and source[i] != quote:
+        i += 2 if source[i] == '\\' else 1
+    return i + 1
+
+def _skip_template(source: str, i: int) -> int:
+    """Index just past the template literal starting at i, including nested ${...} expressions"""
+    i += 1
+    while i < len(source) and source[i] != '`':
+        if source[i] == '\\':
+            i += 2
+        elif source.startswith('${', i):
+            i = _skip_expression(source, i + 2)
+        else:
+            i += 1
+    return i + 1
+
+def _skip_expression(source: str, i: int) -> int:
+    """Index just past the '}' closing a template expression whose body starts at i"""
+    depth = 1
+    while i < len(source):
+        ch = source[i]
+        if ch in '\'"':
+            i = _skip_string(source, i)
+        elif ch == '`':
+            i = _skip_template(source, i)
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = len(source) if end == -1 else end + 2
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = len(source) if end == -1 else end
+        else:
+            if ch == '{':
+                depth += 1
+            elif ch == '}':
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            i += 1
+    return i
+
+def _strip_code(code: str) -> str:
+    """Drop indentation, trailing whitespace and blank lines from code outside literals"""
+    code = re.sub(r'[ \t]*\n[ \t]*', '\n', code)
+    return re.sub(r'\n{2,}', '\n', code)
+
+def minify_js(source: str) -> str:
+    """
+    Conservatively minify JavaScript
+
+    Comments, indentation and blank lines are removed; line breaks are kept
+    so automatic semicolon insertion behaves exactly as in the source.
+    Strings, template literals (with their ${...} expressions) and regex
+    literals are copied untouched.
+
+    Args:
+        source: JavaScript source
+
+    Returns:
+        Minified JavaScript
+    """
+    out = []
+    code = []  # code since the last literal, stripped when a literal or the end is reached
+    i = 0
+    n = len(source)
+    last = ''  # last significant character, to tell regexes from division
+
+    def literal(end):
+        nonlocal i, last
+        out.append(_strip_code(''.join(code)))
+        code.clear()
+        out.append(source[i:end])
+        last = source[i]
+        i = end
+
+    while i < n:
+        ch = source[i]
+        nxt = source[i + 1] if i + 1 < n else ''
+
+        if ch in '\'"':
+            literal(_skip_string(source, i))
+        elif ch == '`':
+            literal(_skip_template(source, i))
+        elif ch == '/' and nxt == '/':
+            while i < n and source[i] != '\n':
+                i += 1
+        elif ch == '/' and nxt == '*':
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            code.append(' ')
+        elif ch == '/' and (last == '' or last in '(,=:[!&|?{};+-*%~^<>' or
+                            re.search(r'\b(return|typeof|case|in|of)\s*$', ''.join(code[-12:]))):
+            end = i + 1
+            in_class = False
+            while end < n and (source[end] != '/' or in_class) and source[end] != '\n':
+                if source[end] == '\\':
+                    end += 1
+                elif source[end] == '[':
+                    in_class = True
+                elif source[end] == ']':
+                    in_class = False
+                end += 1
+            literal(end + 1)
+        else:
+            code.append(ch)
+            if not ch.isspace():
+                last = ch
+            i += 1
+
+    out.append(_strip_code(''.join(code)))
+    return ''.join(out).strip() + '\n'
+
+def minify_css(source: str) -> str:
+    """
+    Minify CSS by removing comments and insignificant whitespace
+
+    Whitespace before ':' is kept because it is significant in selectors
+    (e.g. 'a :hover'); strings are copied untouched.
+
+    Args:
+        source: CSS source
+
+    Returns:
+        Minified CSS
+    """
+    parts = re.split(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')', source)
+    for index in range(0, len(parts), 2):
+        text = re.sub(r'/\*.*?\*/', '', parts[index], flags=re.S)
+        text = re.sub(r'\s+', ' ', text)
+        text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+        text = re.sub(r':\s+', ':', text)
+        parts[index] = text.replace(';}', '}')
+    return ''.join(parts).strip() + '\n'
+
+# Extensions that are minified before hashing
+MINIFIERS = {'.js': minify_js, '.css': minify_css}
+
+def find_asset_sources() -> Dict[str, str]:
+    """
+    List the assets to build
+
+    Returns:
+        Mapping of public name (relative to static/) to source path
+    """
+    sources = {}
+    dist = os.path.abspath(ASSET_DIST_FOLDER)
+    for dirpath, dirnames, filenames in os.walk(STATIC_FOLDER):
+        dirnames[:] = [d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) != dist]
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            sources[os.path.relpath(path, STATIC_FOLDER).replace(os.sep, '/')] = path
+    for name, path in EXTRA_ASSETS.items():
+        if os.path.exists(path):
+            sources[name] = path
+    return sources
+
+def _fingerprint(sources: Dict[str, str]) -> str:
+    """Cheap identity of the source set, to tell whether a build is stale"""
+    digest = hashlib.sha1()
+    for name, path in sorted(sources.items()):
+        stat = os.stat(path)
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+def _hashed_name(name: str, data: bytes) -> str:
+    base, ext = os.path.splitext(name)
+    return f"{base}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+def _write(path: str, data: bytes) -> None:
+    """Write a file atomically so workers never serve a partial asset"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _manifest_path() -> str:
+    return os.path.join(ASSET_DIST_FOLDER, MANIFEST_NAME)
+
+def read_manifest() -> Dict:
+    """Load the build manifest, or an empty one if there is no build"""
+    try:
+        with open(_manifest_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def build_assets() -> Dict:
+    """
+    Build fingerprinted, minified and precompressed assets
+
+    Files from the previous build stay in place so pages rendered by workers
+    that haven't reloaded the manifest yet keep working; older files are
+    removed.
+
+    Returns:
+        The new manifest
+    """
+    sources = find_asset_sources()
+    previous = read_manifest()
+    assets = {}
+    stats = {'bytes_in': 0, 'bytes_out': 0, 'bytes_gzip': 0}
+
+    for name, path in sorted(sources.items()):
+        with open(path, 'rb') as f:
+            data = f.read()
+        stats['bytes_in'] += len(data)
+
+        ext = os.path.splitext(name)[1].lower()
+        if ext in MINIFIERS:
+            data = MINIFIERS[ext](data.decode('utf-8')).encode('utf-8')
+
+        hashed = _hashed_name(name, data)
+        assets[name] = hashed
+        out_path = os.path.join(ASSET_DIST_FOLDER, hashed)
+        stats['bytes_out'] += len(data)
+
+        _write(out_path, data)
+        if ext in COMPRESSIBLE and len(data) >= MIN_COMPRESS_SIZE:
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            _write(out_path + '.gz', compressed)
+            stats['bytes_gzip'] += len(compressed)
+            if brotli is not None:
+                _write(out_path + '.br', brotli.compress(data, quality=11))
+
+    manifest = {
+        'fingerprint': _fingerprint(sources),
+        'assets': assets,
+        'previous': previous.get('assets', {}),
+        'stats': stats
+    }
+
+    keep = set(manifest['assets'].values()) | set(manifest['previous'].values())
+    for dirpath, _, filenames in os.walk(ASSET_DIST_FOLDER):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, ASSET_DIST_FOLDER).replace(os.sep, '/')
+            base = re.sub(r'\.(gz|br)$', '', name)
+            if name != MANIFEST_NAME and not name.endswith('.lock') and base not in keep:
+                os.remove(path)
+
+    _write(_manifest_path(), json.dumps(manifest, indent=2).encode('utf-8'))
+    return manifest
+
+def build_if_stale() -> Dict:
+    """
+    Rebuild the assets when the sources changed since the last build
+
+    Workers start at the same time, so the check and build run under a
+    file lock and only the first worker builds.
+
+    Returns:
+        The current manifest
+    """
+    os.makedirs(ASSET_DIST_FOLDER, exist_ok=True)
+    with open(os.path.join(ASSET_DIST_FOLDER, '.build.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        manifest = read_manifest()
+        if manifest.get('fingerprint') == _fingerprint(find_asset_sources()):
+            return manifest
+        return build_assets()
+
+# Manifest as loaded by this process, reloaded when the file changes
+_manifest = {'mtime': None, 'assets': {}}
+
+def _current_assets() -> Dict[str, str]:
+    try:
+        mtime = os.path.getmtime(_manifest_path())
+    except OSError:
+        return {}
+    if mtime != _manifest['mtime']:
+        _manifest['assets'] = read_manifest().get('assets', {})
+        _manifest['mtime'] = mtime
+    return _manifest['assets']
+
+def asset_url(name: str) -> str:
+    """
+    URL of an asset, fingerprinted when a build exists
+
+    Args:
+        name: Asset path relative to static/, e.g. 'js/app.js'
+
+    Returns:
+        URL of the built asset, or of the plain static file without a build
+    """
+    hashed = _current_assets().get(name)
+    if hashed:
+        return url_for('asset', filename=hashed)
+    if name in EXTRA_ASSETS:
+        return url_for('asset', filename=name)
+    return url_for('static', filename=name)
+
+def _accepts(encoding: str) -> bool:
+    return request.accept_encodings[encoding] > 0
+
+def serve_asset(filename: str):
+    """
+    Serve a built asset, precompressed when the client accepts it
+
+    Fingerprinted files never change, so they are cached for ASSET_MAX_AGE
+    and marked immutable; browsers then load them without any request.
+    """
+    dist = os.path.abspath(ASSET_DIST_FOLDER)
+    built = os.path.join(dist, filename)
+    if filename in EXTRA_ASSETS and not os.path.isfile(built):
+        # Unbuilt extras are served like plain static files
+        return send_from_directory(os.path.abspath(os.path.dirname(EXTRA_ASSETS[filename]) or '.'),
+                                   os.path.basename(EXTRA_ASSETS[filename]))
+
+    if filename == MANIFEST_NAME or filename.startswith('.') or filename.endswith(('.gz', '.br', '.tmp')):
+        abort(404)
+
+    variant, encoding = filename, None
+    for suffix, name in (('.br', 'br'), ('.gz', 'gzip')):
+        if _accepts(name) and os.path.isfile(built + suffix):
+            variant, encoding = filename + suffix, name
+            break
+
+    # send_from_directory rejects paths that escape the dist folder
+    response = send_from_directory(dist, variant, max_age=ASSET_MAX_AGE,
+                                   mimetype=mimetypes.guess_type(filename)[0])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def init_assets(app) -> Dict:
+    """
+    Register the asset route and template helper, building stale assets
+
+    Args:
+        app: The Flask application
+
+    Returns:
+        The manifest in use (empty when there is no build)
+    """
+    manifest = {}
+    if ASSETS_AUTO_BUILD:
+        try:
+            manifest = build_if_stale()
+        except Exception as e:
+            logging.error(f"Error building static assets, serving unbuilt files: {str(e)}")
+    else:
+        manifest = read_manifest()
+
+    app.add_url_rule('/assets/<path:filename>', 'asset', serve_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
+    return manifest
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Build fingerprinted, precompressed static assets")
+    parser.add_argument('--if-stale', action='store_true', help="only build when sources changed")
+    args = parser.parse_args(argv)
+
+    manifest = build_if_stale() if args.if_stale else build_assets()
+    stats = manifest.get('stats', {})
+    for name, hashed in sorted(manifest['assets'].items()):
+        print(f"{name} -> {hashed}")
+    if stats:
+        print(f"{stats['bytes_in']} bytes in, {stats['bytes_out']} minified, "
+              f"{stats['bytes_gzip']} gzipped"
+              f"{'' if brotli is not None else '; brotli not installed, gzip only'}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+Chunked, resumable upload utilities for Exam Pal
+Streams large files to disk chunk by chunk instead of buffering whole requests
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import fcntl
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from werkzeug.utils import secure_filename
+
+from config import ALLOWED_EXTENSIONS, MAX_UPLOAD_SIZE, PARTIAL_UPLOAD_FOLDER
+from utils.file_processor import allowed_file, unique_upload_path
+
+# Size of the blocks copied from the request stream to disk
+STREAM_BLOCK_SIZE = 64 * 1024
+
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Running SHA-256 per upload: upload_id -> (hasher, bytes hashed so far).
+# This is per-process. Chunks that land on a worker without an up-to-date
+# hasher are not hashed there; finalize_upload then hashes the file from
+# disk once, so I/O stays linear however chunks are spread across workers.
+_hashers: Dict[str, Tuple[Any, int]] = {}
+_hashers_lock = threading.Lock()
+
+def _meta_path(upload_id: str) -> str:
+    """Path of the metadata file for an in-progress upload"""
+    return os.path.join(PARTIAL_UPLOAD_FOLDER, f"{upload_id}.json")
+
+def _part_path(upload_id: str) -> str:
+    """Path of the partial data file for an in-progress upload"""
+    return os.path.join(PARTIAL_UPLOAD_FOLDER, f"{upload_id}.part")
+
+def _load_meta(upload_id: str) -> Optional[Dict]:
+    """Load upload metadata, or None if the upload id is unknown"""
+    if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+        return None
+
+    try:
+        with open(_meta_path(upload_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _status(meta: Dict, received: int) -> Dict:
+    """Build the status dictionary returned to clients"""
+    return {
+        'upload_id': meta['upload_id'],
+        'filename': meta['filename'],
+        'size': meta['size'],
+        'received': received
+    }
+
+def _cached_hasher(upload_id: str, received: int) -> Optional[Any]:
+    """
+    Get a copy of this process's running hasher if it covers exactly the bytes received
+
+    A copy is returned so a failed chunk never leaves rejected bytes in the
+    cached hash; stale entries are dropped.
+    """
+    with _hashers_lock:
+        hasher, hashed = _hashers.get(upload_id, (None, 0))
+        if hasher is None:
+            return None
+        if hashed != received:
+            _hashers.pop(upload_id, None)
+            return None
+        return hasher.copy()
+
+def _hash_file(part_file) -> Any:
+    """Hash a partial file from disk; must be called with the file locked"""
+    hasher = hashlib.sha256()
+    part_file.seek(0)
+    while True:
+        block = part_file.read(STREAM_BLOCK_SIZE)
+        if not block:
+            break
+        hasher.update(block)
+    return hasher
+
+def init_upload(filename: str, size: int) -> Tuple[bool, str, Optional[Dict]]:
+    """
+    Start a new chunked upload
+
+    Args:
+        filename: Original filename supplied by the client
+        size: Total size of the file in bytes
+
+    Returns:
+        Tuple of (success: bool, message: str, status: Optional[Dict])
+    """
+    if not filename or not allowed_file(filename):
+        return False, f"File type not allowed. Supported types: {', '.join(ALLOWED_EXTENSIONS)}", None
+
+    if isinstance(size, bool) or not isinstance(size, int) or size <= 0:
+        return False, "Invalid file size", None
+
+    if size > MAX_UPLOAD_SIZE:
+        return False, f"File is too large. Maximum size is {MAX_UPLOAD_SIZE // (1024 * 1024)}MB", None
+
+    meta = {
+        'upload_id': uuid.uuid4().hex,
+        'filename': secure_filename(filename),
+        'size': size,
+        'created': time.time()
+    }
+
+    try:
+        open(_part_path(meta['upload_id']), 'wb').close()
+        with open(_meta_path(meta['upload_id']), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+    except Exception as e:
+        logging.error(f"Error starting chunked upload: {str(e)}")
+        return False, f"Error starting upload: {str(e)}", None
+
+    return True, "Upload started", _status(meta, 0)
+
+def get_upload_status(upload_id: str) -> Optional[Dict]:
+    """
+    Get the progress of a chunked upload so a client can resume it
+
+    Args:
+        upload_id: Identifier returned by init_upload
+
+    Returns:
+        Status dictionary, or None if the upload is unknown
+    """
+    meta = _load_meta(upload_id)
+    if meta is None:
+        return None
+
+    try:
+        received = os.path.getsize(_part_path(upload_id))
+    except OSError:
+        return None
+
+    return _status(meta, received)
+
+def write_chunk(upload_id: str, offset: int, stream) -> Tuple[bool, str, Optional[Dict]]:
+    """
+    Append a chunk read from a stream to a partial upload
+
+    The chunk is copied to disk in small blocks, so memory use per request
+    stays flat regardless of chunk or file size. It is hashed as it goes
+    when this process has hashed all earlier chunks.
+
+    Args:
+        upload_id: Identifier returned by init_upload
+        offset: Byte offset the chunk starts at; must equal the bytes received so far
+        stream: File-like object to read the chunk from
+
+    Returns:
+        Tuple of (success: bool, message: str, status: Optional[Dict])
+    """
+    meta = _load_meta(upload_id)
+    if meta is None:
+        return False, "Upload not found", None
+
+    try:
+        with open(_part_path(upload_id), 'r+b') as part_file:
+            # Serialise writers to the same upload across threads and workers
+            fcntl.flock(part_file.fileno(), fcntl.LOCK_EX)
+
+            received = os.fstat(part_file.fileno()).st_size
+            if offset != received:
+                return False, f"Offset mismatch: expected {received}", _status(meta, received)
+
+            # The first chunk starts a hasher; other workers' chunks are hashed at finalize
+            hasher = hashlib.sha256() if received == 0 else _cached_hasher(upload_id, received)
+            part_file.seek(received)
+
+            remaining = meta['size'] - received
+            while True:
+                block = stream.read(STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                if len(block) > remaining:
+                    part_file.truncate(received)
+                    return False, "Chunk exceeds declared file size", _status(meta, received)
+                part_file.write(block)
+                if hasher is not None:
+                    hasher.update(block)
+                remaining -= len(block)
+
+            part_file.flush()
+            received = meta['size'] - remaining
+
+            if hasher is not None:
+                with _hashers_lock:
+                    _hashers[upload_id] = (hasher, received)
+    except FileNotFoundError:
+        return False, "Upload not found", None
+    except Exception as e:
+        logging.error(f"Error writing upload chunk: {str(e)}")
+        return False, f"Error writing chunk: {str(e)}", get_upload_status(upload_id)
+
+    return True, "Chunk received", _status(meta, received)
+
+def finalize_upload(upload_id: str, checksum: Optional[str] = None) -> Tuple[bool, str, Optional[str], Optional[str]]:
+    """
+    Complete a chunked upload and move the file into the upload folder
+
+    Args:
+        upload_id: Identifier returned by init_upload
+        checksum: Optional hex SHA-256 of the whole file to verify against
+
+    Returns:
+        Tuple of (success: bool, message: str, saved_path: Optional[str], sha256: Optional[str])
+    """
+    meta = _load_meta(upload_id)
+    if meta is None:
+        return False, "Upload not found", None, None
+
+    part_path = _part_path(upload_id)
+    try:
+        with open(part_path, 'rb') as part_file:
+            fcntl.flock(part_file.fileno(), fcntl.LOCK_EX)
+
+            received = os.fstat(part_file.fileno()).st_size
+            if received != meta['size']:
+                return False, f"Upload incomplete: received {received} of {meta['size']} bytes", None, None
+
+            hasher = _cached_hasher(upload_id, received) or _hash_file(part_file)
+            digest = hasher.hexdigest()
+            if checksum and checksum.lower() != digest:
+                return False, "Checksum mismatch", None, digest
+
+            # Linking fails instead of overwriting if another upload takes
+            # the same name between picking it and moving the file in
+            while True:
+                file_path = unique_upload_path(meta['filename'])
+                try:
+                    os.link(part_path, file_path)
+                    break
+                except FileExistsError:
+                    continue
+            os.remove(part_path)
+    except FileNotFoundError:
+        return False, "Upload not found", None, None
+    except Exception as e:
+        logging.error(f"Error finalizing upload: {str(e)}")
+        return False, f"Error finalizing upload: {str(e)}", None, None
+
+    abort_upload(upload_id)
+
+    return True, "File uploaded successfully", file_path, digest
+
+def abort_upload(upload_id: str) -> bool:
+    """
+    Discard an in-progress upload and its partial data
+
+    Args:
+        upload_id: Identifier returned by init_upload
+
+    Returns:
+        True if anything was removed
+    """
+    if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+        return False
+
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+
+    removed = False
+    for path in (_part_path(upload_id), _meta_path(upload_id)):
+        try:
+            os.remove(path)
+            removed = True
+        except FileNotFoundError:
+            pass
+
+    return removed
@@ -4,23 +4,59 @@ Handles PDF text extraction and image processing
 """
 
 import os
+import json
+import hashlib
 import logging
 import tempfile
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 
 import PyPDF2
 from werkzeug.utils import secure_filename
 from PIL import Image
 import requests
 
-from config import ALLOWED_EXTENSIONS, UPLOAD_FOLDER
+from config import ALLOWED_EXTENSIONS, UPLOAD_FOLDER, EXTRACTED_FOLDER, OCR_CACHE_FOLDER
+from utils.text_cleaner import clean_pages
+from utils.storage import touch_access
+
+# Pages with less extracted text than this are treated as scanned images
+PAGE_TEXT_MIN_CHARS = 25
+
+# Start of the placeholder stored for a page or file that failed to extract
+EXTRACTION_ERROR = "[Error extracting text"
 
 def allowed_file(filename: str) -> bool:
     """Check if a file has an allowed extension"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def unique_upload_path(filename: str, upload_dir: str = None) -> str:
+    """
+    Build a safe, non-clashing path for a new upload
+    
+    Args:
+        filename: Original filename supplied by the client
+        upload_dir: Directory the file will be saved in (defaults to UPLOAD_FOLDER)
+        
+    Returns:
+        Path inside upload_dir that does not exist yet
+    """
+    if upload_dir is None:
+        upload_dir = UPLOAD_FOLDER
+    
+    # Secure the filename to prevent path traversal attacks
+    filename = secure_filename(filename)
+    
+    # Create a unique filename to prevent overwrites
+    base, ext = os.path.splitext(filename)
+    counter = 1
+    while os.path.exists(os.path.join(upload_dir, filename)):
+        filename = f"{base}_{counter}{ext}"
+        counter += 1
+    
+    return os.path.join(upload_dir, filename)
+
 def save_uploaded_file(file, upload_dir: str = None) -> Tuple[bool, str, Optional[str]]:
     """
     Save an uploaded file to the specified directory
@@ -45,17 +81,7 @@ def save_uploaded_file(file, upload_dir: str = None) -> Tuple[bool, str, Optiona
         return False, f"File type not allowed. Supported types: {', '.join(ALLOWED_EXTENSIONS)}", None
     
     try:
-        # Secure the filename to prevent path traversal attacks
-        filename = secure_filename(file.filename)
-        
-        # Create a unique filename to prevent overwrites
-        base, ext = os.path.splitext(filename)
-        counter = 1
-        while os.path.exists(os.path.join(upload_dir, filename)):
-            filename = f"{base}_{counter}{ext}"
-            counter += 1
-        
-        file_path = os.path.join(upload_dir, filename)
+        file_path = unique_upload_path(file.filename, upload_dir)
         file.save(file_path)
         
         return True, "File uploaded successfully", file_path
@@ -63,30 +89,150 @@ def save_uploaded_file(file, upload_dir: str = None) -> Tuple[bool, str, Optiona
         logging.error(f"Error saving file: {str(e)}")
         return False, f"Error saving file: {str(e)}", None
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+def extract_pages_from_pdf(pdf_path: str, ocr: bool = True) -> List[str]:
     """
-    Extract text content from a PDF file
+    Extract text content from a PDF file, one entry per page
+    
+    Pages without a usable text layer (scanned pages) are OCR'd from their
+    embedded images; pages that do have text are never sent to OCR. Any
+    short text layer on a scanned page (a caption or heading) is kept
+    ahead of the OCR text.
     
     Args:
         pdf_path: Path to the PDF file
+        ocr: Whether to OCR image-only pages
         
     Returns:
-        Extracted text as a string
+        List of extracted page texts
     """
-    text = ""
+    pages = []
+    ocr_pages = 0
     try:
         with open(pdf_path, 'rb') as file:
             reader = PyPDF2.PdfReader(file)
-            num_pages = len(reader.pages)
             
-            for page_num in range(num_pages):
-                page = reader.pages[page_num]
-                text += page.extract_text() + "\n\n"
+            for page in reader.pages:
+                text = page.extract_text() or ""
+                
+                if ocr and classify_pdf_page(text) == 'image':
+                    images = get_page_images(page)
+                    if images:
+                        ocr_text = ocr_page_images(images)
+                        text = f"{text.strip()}\n{ocr_text}" if text.strip() else ocr_text
+                        ocr_pages += 1
+                
+                pages.append(text)
     except Exception as e:
         logging.error(f"Error extracting text from PDF: {str(e)}")
-        text = f"[Error extracting text: {str(e)}]"
+        pages = [f"{EXTRACTION_ERROR}: {str(e)}]"]
+    
+    if ocr_pages:
+        logging.info(f"OCR'd {ocr_pages} of {len(pages)} pages in {os.path.basename(pdf_path)}")
+    
+    return pages
+
+def classify_pdf_page(page_text: str) -> str:
+    """
+    Classify a PDF page by its text layer
+    
+    Args:
+        page_text: Text extracted from the page's text layer
+        
+    Returns:
+        'text' if the page has a usable text layer, 'image' otherwise
+    """
+    return 'text' if len(page_text.strip()) >= PAGE_TEXT_MIN_CHARS else 'image'
+
+def get_page_images(page) -> List:
+    """
+    Get the images embedded in a PDF page
+    
+    Args:
+        page: PyPDF2 page object
+        
+    Returns:
+        List of PyPDF2 File objects with 'name' and 'data'
+    """
+    try:
+        return page.images
+    except Exception as e:
+        # Pages without resources, or with image filters PyPDF2 can't decode
+        logging.debug(f"Could not read page images: {str(e)}")
+        return []
+
+def _ocr_cache_path(page_hash: str) -> str:
+    """Path of the cached OCR text for a page"""
+    return os.path.join(OCR_CACHE_FOLDER, f"{page_hash}.txt")
+
+def ocr_page_images(images: List) -> str:
+    """
+    OCR the images of a scanned PDF page, using the cache when possible
     
-    return text
+    The cache is keyed by a hash of the page's image bytes, so the same
+    scanned page in a re-uploaded or different PDF is only OCR'd once.
+    
+    Args:
+        images: PyPDF2 File objects for the page, in page order
+        
+    Returns:
+        Extracted text for the page
+    """
+    page_hash = hashlib.sha256()
+    for image in images:
+        page_hash.update(image.data)
+    cache_path = _ocr_cache_path(page_hash.hexdigest())
+    
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            page_text = f.read()
+        touch_access(cache_path)
+        return page_text
+    except OSError:
+        pass
+    
+    texts = []
+    failed = False
+    for image in images:
+        suffix = os.path.splitext(image.name)[1] or '.png'
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+            tmp.write(image.data)
+        try:
+            text = extract_text_from_image(tmp.name)
+        finally:
+            os.remove(tmp.name)
+        
+        failed = failed or text.startswith(EXTRACTION_ERROR)
+        texts.append(text)
+    
+    page_text = "\n".join(texts)
+    
+    # Don't cache failures so the page is retried next time
+    if not failed:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(page_text)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logging.error(f"Error caching OCR text: {str(e)}")
+    
+    return page_text
+
+def extract_text_from_pdf(pdf_path: str) -> str:
+    """
+    Extract text content from a PDF file
+    
+    Args:
+        pdf_path: Path to the PDF file
+        
+    Returns:
+        Extracted text as a string
+    """
+    return join_pages(extract_pages_from_pdf(pdf_path))
+
+def join_pages(pages: List[str]) -> str:
+    """Join per-page texts into a single document string"""
+    return "".join(page + "\n\n" for page in pages)
 
 def upload_to_groq_vision(file_path: str) -> str:
     """
@@ -157,41 +303,286 @@ def extract_text_from_image(image_path: str) -> str:
         return extract_text_from_image_with_groq(image_path)
     except Exception as e:
         logging.error(f"Error extracting text from image using Groq Vision: {str(e)}")
-        return f"[Error extracting text: {str(e)}]"
+        return f"{EXTRACTION_ERROR}: {str(e)}]"
+
+def _extracted_record_path(file_path: str) -> str:
+    """Path of the extracted-text record stored for an uploaded file"""
+    return os.path.join(EXTRACTED_FOLDER, os.path.basename(file_path) + '.json')
+
+def save_extracted_content(file_info: Dict, pages: List[str], cleanup: Optional[Dict] = None,
+                           exclusive: bool = False, failed_pages: Optional[List[int]] = None) -> bool:
+    """
+    Store the extracted pages of a file so later requests don't re-extract it
+    
+    Args:
+        file_info: Metadata dictionary returned by process_file; an 'mtime'
+            key is used instead of the file's own when the record is written
+            before the file is in place
+        pages: Cleaned extracted text, one entry per page
+        cleanup: Stats from the cleanup stage (optional)
+        exclusive: Fail instead of replacing an existing record; write
+            errors are raised rather than logged in this mode, so callers can
+            tell them apart from an existing record
+        failed_pages: Indexes of pages whose extraction failed; the record
+            is kept for this request but treated as stale afterwards
+
+    Returns:
+        True if the record was written, False if it could not be (or, when
+        exclusive, because a record already exists)
+    """
+    record = {
+        'id': file_info['id'],
+        'name': file_info['name'],
+        'type': file_info['type'],
+        'size': file_info['size'],
+        'mtime': file_info.get('mtime') or os.path.getmtime(file_info['path']),
+        'sha256': file_info.get('sha256'),
+        'cleanup': cleanup or {},
+        'failed_pages': failed_pages or [],
+        'pages': pages
+    }
+    
+    record_path = _extracted_record_path(file_info['path'])
+    tmp_path = f"{record_path}.{os.getpid()}.tmp"
+    if exclusive:
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(record, f)
+            # Linking is atomic and fails if the record already exists
+            os.link(tmp_path, record_path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, record_path)
+        return True
+    except Exception as e:
+        logging.error(f"Error saving extracted content: {str(e)}")
+        return False
+
+def load_extracted_content(file_path: str, include_failed: bool = False) -> Optional[Dict]:
+    """
+    Load the stored extracted-text record for a file
+    
+    Args:
+        file_path: Path to the uploaded file
+        include_failed: Return a record even if some of its pages failed to
+            extract (e.g. during a Vision API outage); such records are
+            otherwise stale so the pages are retried
+        
+    Returns:
+        The stored record, or None if missing or out of date
+    """
+    record_path = _extracted_record_path(file_path)
+    try:
+        with open(record_path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        
+        # A record is only valid for the exact file it was extracted from,
+        # and records from before the cleanup stage are re-extracted
+        if record.get('size') != os.path.getsize(file_path) or \
+           record.get('mtime') != os.path.getmtime(file_path) or \
+           'cleanup' not in record:
+            return None
+        if record.get('failed_pages') and not include_failed:
+            return None
+        
+        return record
+    except (OSError, ValueError):
+        return None
 
-def process_file(file_path: str) -> Dict:
+def file_sha256(file_path: str) -> str:
+    """
+    Hash a file's content, used to recognise the same material under any name
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        Hex SHA-256 digest of the file
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def extract_file_pages(file_path: str) -> Tuple[str, List[str], Dict, List[int]]:
+    """
+    Extract and clean the pages of a file without storing anything
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        Tuple of (file type, cleaned pages, cleanup stats, indexes of pages
+        whose extraction failed)
+    """
+    # Determine file type and extract content
+    ext = os.path.splitext(file_path)[1].lower()
+    
+    if ext == '.pdf':
+        file_type = 'pdf'
+        pages = extract_pages_from_pdf(file_path)
+    elif ext in ['.jpg', '.jpeg', '.png']:
+        file_type = 'image'
+        pages = [extract_text_from_image(file_path)]
+    else:
+        file_type = 'unknown'
+        pages = ["[Unsupported file type]"]
+    
+    failed_pages = [i for i, page in enumerate(pages) if EXTRACTION_ERROR in page]
+    if failed_pages:
+        logging.warning(f"Extraction failed for {len(failed_pages)} of {len(pages)} pages "
+                        f"in {os.path.basename(file_path)}")
+    
+    pages, cleanup = clean_pages(pages)
+    if cleanup['chars_before']:
+        logging.info(f"Cleanup removed {cleanup['chars_before'] - cleanup['chars_after']} of "
+                     f"{cleanup['chars_before']} chars from {os.path.basename(file_path)}")
+    
+    return file_type, pages, cleanup, failed_pages
+
+def process_file(file_path: str, sha256: Optional[str] = None) -> Dict:
     """
     Process an uploaded file and extract its content
     
+    The extracted pages are cleaned once here (see utils.text_cleaner) and
+    stored in EXTRACTED_FOLDER so the content endpoint and the chat/study
+    plan routes can read them without extracting again.
+    
     Args:
         file_path: Path to the uploaded file
+        sha256: Content hash if already known (e.g. from a chunked upload),
+            to avoid reading the file again
         
     Returns:
         Dictionary with file info and extracted content
     """
     file_info = {
+        'id': os.path.basename(file_path),
         'path': file_path,
         'name': os.path.basename(file_path),
         'size': os.path.getsize(file_path),
+        'sha256': sha256 or file_sha256(file_path),
         'content': "",
-        'type': ""
+        'type': "",
+        'pages': 0
     }
     
-    # Determine file type and extract content
-    ext = os.path.splitext(file_path)[1].lower()
+    file_info['type'], pages, cleanup, failed_pages = extract_file_pages(file_path)
     
-    if ext == '.pdf':
-        file_info['type'] = 'pdf'
-        file_info['content'] = extract_text_from_pdf(file_path)
-    elif ext in ['.jpg', '.jpeg', '.png']:
-        file_info['type'] = 'image'
-        file_info['content'] = extract_text_from_image(file_path)
-    else:
-        file_info['type'] = 'unknown'
-        file_info['content'] = "[Unsupported file type]"
+    file_info['content'] = join_pages(pages)
+    file_info['pages'] = len(pages)
+    file_info['cleanup'] = cleanup
+    file_info['failed_pages'] = failed_pages
+    save_extracted_content(file_info, pages, cleanup, failed_pages=failed_pages)
     
     return file_info
 
+def file_metadata(file_info: Dict) -> Dict:
+    """Return a copy of a file info dictionary without the extracted content"""
+    return {key: value for key, value in file_info.items() if key != 'content'}
+
+def get_file_pages(file_path: str) -> List[str]:
+    """
+    Get the extracted pages of an uploaded file, extracting them if needed
+    
+    Args:
+        file_path: Path to the uploaded file
+        
+    Returns:
+        List of extracted page texts
+    """
+    record = load_extracted_content(file_path)
+    if record is None:
+        process_file(file_path)
+        # Serve pages that failed this time as they are; they are retried
+        # on the next request
+        record = load_extracted_content(file_path, include_failed=True)
+    
+    touch_access(file_path)
+    return record['pages'] if record else []
+
+def get_corpus_version(files: List[Dict]) -> str:
+    """
+    Compute a version string for a set of uploaded files
+    
+    The version changes whenever a file is added, removed or replaced, so it
+    is consistent across worker processes without any shared state.
+    
+    Args:
+        files: File info dictionaries from get_all_uploaded_files
+        
+    Returns:
+        Hex digest identifying this exact set of files
+    """
+    version = hashlib.sha1()
+    for file_info in sorted(files, key=lambda f: f['id']):
+        version.update(f"{file_info['id']}:{file_info['size']}:{file_info.get('mtime', 0)}\n".encode('utf-8'))
+    return version.hexdigest()
+
+def load_materials(files: List[Dict]) -> List[Dict]:
+    """
+    Read the extracted content of a set of uploaded files
+    
+    Args:
+        files: File info dictionaries from get_all_uploaded_files
+        
+    Returns:
+        List of file info dictionaries including a 'content' key
+    """
+    materials = []
+    for file_info in files:
+        try:
+            pages = get_file_pages(file_info['path'])
+        except FileNotFoundError:
+            # Evicted or deleted while we were reading the corpus
+            continue
+        materials.append({**file_info, 'content': join_pages(pages), 'pages': len(pages)})
+    return materials
+
+def get_corpus(user_id: str = "default") -> Tuple[str, List[Dict], Callable[[], List[Dict]]]:
+    """
+    Get the uploaded files, the corpus version and a loader for their content
+    
+    Only the file listing is read here. The prompt builders memoize their
+    materials sections by corpus version and call the loader on a miss, so
+    the full text of the corpus is never kept in memory between requests.
+    
+    Args:
+        user_id: Identifier for the user (for future multi-user support)
+        
+    Returns:
+        Tuple of (corpus version, list of file info dictionaries, function
+        returning the file info dictionaries with a 'content' key)
+    """
+    files = get_all_uploaded_files(user_id)
+    
+    # A memoized section uses the files without reading them
+    for file_info in files:
+        touch_access(file_info['path'])
+    
+    return get_corpus_version(files), files, lambda: load_materials(files)
+
+def get_materials(user_id: str = "default") -> List[Dict]:
+    """
+    Get all uploaded files together with their extracted content
+    
+    Args:
+        user_id: Identifier for the user (for future multi-user support)
+        
+    Returns:
+        List of file info dictionaries including a 'content' key
+    """
+    return load_materials(get_all_uploaded_files(user_id))
+
 def get_all_uploaded_files(user_id: str = "default") -> List[Dict]:
     """
     Get information about all uploaded files for a user
@@ -209,10 +600,13 @@ def get_all_uploaded_files(user_id: str = "default") -> List[Dict]:
         for filename in os.listdir(upload_dir):
             file_path = os.path.join(upload_dir, filename)
             if os.path.isfile(file_path):
+                stat = os.stat(file_path)
                 file_info = {
+                    'id': filename,
                     'path': file_path,
                     'name': filename,
-                    'size': os.path.getsize(file_path),
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime,
                     'type': os.path.splitext(filename)[1].lower()[1:]  # Extension without dot
                 }
                 files.append(file_info)
@@ -234,6 +628,12 @@ def delete_file(file_path: str) -> Tuple[bool, str]:
     try:
         if os.path.exists(file_path):
             os.remove(file_path)
+            
+            # Drop the extracted text along with the file
+            record_path = _extracted_record_path(file_path)
+            if os.path.exists(record_path):
+                os.remove(record_path)
+            
             return True, "File deleted successfully"
         else:
             return False, "File not found"
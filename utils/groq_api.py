@@ -7,10 +7,17 @@ import os
 import json
 import logging
 import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterator, Tuple
 
 import requests
 
+from utils.metrics import timed
+from utils.json_stream import IncrementalPlanParser
+from utils.prompts import (
+    chat_system_prompt, build_chat_messages, study_plan_messages,
+    build_batch_messages, estimate_tokens, BATCH_INSTRUCTIONS, Materials
+)
+
 # Get API key from environment variables
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
@@ -22,6 +29,11 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+# Token budgets for batched practice questions
+MODEL_CONTEXT_TOKENS = 8192
+BATCH_ANSWER_TOKENS = 350  # Room for a ~200 word answer
+BATCH_MAX_COMPLETION_TOKENS = 4000
+
 def is_api_key_valid() -> bool:
     """Check if the Groq API key is set and valid"""
     if not GROQ_API_KEY:
@@ -50,14 +62,27 @@ def is_api_key_valid() -> bool:
         logging.error(f"Error validating API key: {str(e)}")
         return False
 
-def generate_study_plan(materials: List[Dict[str, Any]], goal: str, deadline: str) -> Dict:
+def _days_until(deadline: str) -> int:
+    """Days from now until a deadline string, falling back to two weeks"""
+    # Parse deadline string to datetime
+    try:
+        deadline_dt = datetime.datetime.fromisoformat(deadline)
+        return (deadline_dt - datetime.datetime.now()).days
+    except Exception as e:
+        logging.error(f"Error parsing deadline: {str(e)}")
+        return 14  # Fallback to 2 weeks
+
+def generate_study_plan(materials: Materials, goal: str, deadline: str,
+                        corpus_version: Optional[str] = None) -> Dict:
     """
     Generate a personalized study plan using Groq API
     
     Args:
-        materials: List of dictionaries containing file info and extracted content
+        materials: List of dictionaries containing file info and extracted
+            content, or a function returning it (see get_corpus)
         goal: Study goal selected by the user
         deadline: Deadline date and time
+        corpus_version: Version of the materials, used to reuse the prompt's materials section
         
     Returns:
         Dictionary containing the generated study plan
@@ -65,81 +90,10 @@ def generate_study_plan(materials: List[Dict[str, Any]], goal: str, deadline: st
     if not GROQ_API_KEY:
         return {"error": "Groq API key is not set. Please set the GROQ_API_KEY environment variable."}
     
-    # Parse deadline string to datetime
-    try:
-        deadline_dt = datetime.datetime.fromisoformat(deadline)
-        days_until_deadline = (deadline_dt - datetime.datetime.now()).days
-    except Exception as e:
-        logging.error(f"Error parsing deadline: {str(e)}")
-        days_until_deadline = 14  # Fallback to 2 weeks
-    
-    # Prepare the material content (limit length to avoid token limit issues)
-    material_content = ""
-    for material in materials:
-        content = material.get('content', '')
-        # Limit each material to 2000 chars to avoid hitting token limits
-        if len(content) > 2000:
-            content = content[:2000] + "... [content truncated]"
-        
-        material_content += f"--- {material.get('name', 'Unnamed material')} ---\n{content}\n\n"
-    
-    # Limit overall content length
-    if len(material_content) > 8000:
-        material_content = material_content[:8000] + "... [content truncated]"
-    
-    # Map goal to difficulty level
-    goal_descriptions = {
-        "pass": "just pass the exam with minimal effort",
-        "good": "get a good grade (B or equivalent)",
-        "ace": "ace the exam (A or equivalent)",
-        "master": "master the material completely for long-term knowledge"
-    }
-    
-    goal_description = goal_descriptions.get(goal, "do well on the exam")
-    
-    # Create prompt for Groq API
-    system_prompt = """
-    You are Exam Pal, an AI study assistant designed to help students prepare for exams effectively.
-    Your task is to create a personalized study plan based on the student's uploaded materials,
-    their goal, and their exam deadline. The plan should be specific, actionable, and tailored to the content.
-    
-    The study plan should include:
-    1. An overview of the material and key topics to focus on
-    2. A timeline with specific milestones and tasks broken down by date
-    3. Learning strategies appropriate for the material
-    4. Recommended practice exercises or self-assessment methods
-    
-    IMPORTANT: Identify units, chapters, or major topics in the materials and organize the study plan 
-    to follow these units in a logical progression. Each milestone should focus on specific units or topics.
-    
-    Your response should be in JSON format with the following structure:
-    {
-        "overview": "General overview and approach",
-        "milestones": [
-            {
-                "date": "YYYY-MM-DD",
-                "title": "Milestone title",
-                "description": "Description of this milestone",
-                "unit": "Unit or topic name this milestone covers",
-                "tasks": ["Task 1", "Task 2", ...]
-            },
-            ...
-        ]
-    }
-    
-    Ensure the milestones are distributed evenly from now until the deadline, and organize them by units or topics when available.
-    """
-    
-    user_prompt = f"""
-    Create a study plan for me based on these materials:
-    
-    {material_content}
+    days_until_deadline = _days_until(deadline)
     
-    My goal is to {goal_description}.
-    My exam is in {days_until_deadline} days (on {deadline}).
-    
-    Please make the plan specific to the content in these materials and provide a realistic schedule.
-    """
+    with timed('prompt.study_plan.assemble'):
+        messages = study_plan_messages(materials, goal, deadline, days_until_deadline, corpus_version)
     
     try:
         response = requests.post(
@@ -147,10 +101,7 @@ def generate_study_plan(materials: List[Dict[str, Any]], goal: str, deadline: st
             headers=HEADERS,
             json={
                 "model": DEFAULT_MODEL,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                "messages": messages,
                 "temperature": 0.7,
                 "max_tokens": 4000
             },
@@ -187,14 +138,86 @@ def generate_study_plan(materials: List[Dict[str, Any]], goal: str, deadline: st
         logging.error(f"Error generating study plan: {str(e)}")
         return {"error": f"Failed to generate study plan: {str(e)}"}
 
-def chat_with_materials(materials: List[Dict[str, Any]], message: str, chat_history: Optional[List] = None) -> str:
+def stream_study_plan(materials: Materials, goal: str, deadline: str,
+                      corpus_version: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Generate a study plan, yielding each part as soon as it is complete
+    
+    Requests Groq JSON mode with streaming and feeds the streamed text to an
+    incremental parser, so milestones can be shown while the rest of the
+    plan is still being generated.
+    
+    Args:
+        materials: List of dictionaries containing file info and extracted
+            content, or a function returning it (see get_corpus)
+        goal: Study goal selected by the user
+        deadline: Deadline date and time
+        corpus_version: Version of the materials, used to reuse the prompt's materials section
+        
+    Yields:
+        (event, value) pairs: ('overview', str), ('milestone', dict), and
+        finally ('done', full plan dict) or ('error', message)
+    """
+    if not GROQ_API_KEY:
+        yield 'error', "Groq API key is not set. Please set the GROQ_API_KEY environment variable."
+        return
+    
+    with timed('prompt.study_plan.assemble'):
+        messages = study_plan_messages(materials, goal, deadline, _days_until(deadline), corpus_version)
+    
+    parser = IncrementalPlanParser()
+    
+    try:
+        with requests.post(
+            GROQ_API_URL,
+            headers=HEADERS,
+            json={
+                "model": DEFAULT_MODEL,
+                "messages": messages,
+                "temperature": 0.7,
+                "max_tokens": 4000,
+                "response_format": {"type": "json_object"},
+                "stream": True
+            },
+            timeout=30,
+            stream=True
+        ) as response:
+            if response.status_code != 200:
+                logging.error(f"Groq API error: {response.status_code} - {response.text}")
+                yield 'error', f"Failed to generate study plan: {response.text}"
+                return
+            
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                
+                data = line[len("data: "):]
+                if data == "[DONE]":
+                    break
+                
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    for event in parser.feed(delta):
+                        yield event
+    
+    except Exception as e:
+        logging.error(f"Error streaming study plan: {str(e)}")
+        yield 'error', f"Failed to generate study plan: {str(e)}"
+        return
+    
+    yield 'done', parser.result()
+
+def chat_with_materials(materials: Materials, message: str, chat_history: Optional[List] = None,
+                        corpus_version: Optional[str] = None) -> str:
     """
     Generate chat responses based on uploaded materials
     
     Args:
-        materials: List of dictionaries containing file info and extracted content
+        materials: List of dictionaries containing file info and extracted
+            content, or a function returning it (see get_corpus)
         message: User's message
         chat_history: Previous chat history (optional)
+        corpus_version: Version of the materials, used to reuse the prompt's materials section
         
     Returns:
         AI-generated response text
@@ -205,69 +228,10 @@ def chat_with_materials(materials: List[Dict[str, Any]], message: str, chat_hist
     if not chat_history:
         chat_history = []
     
-    # Process larger PDFs by breaking them down into chunks
-    material_content = ""
-    total_pdf_size = 0
-    
-    # First count total content size to determine allocation per file
-    for material in materials:
-        content = material.get('content', '')
-        total_pdf_size += len(content)
-    
-    # Calculate a fair share of tokens per material
-    max_total_content = 10000  # Increased from 6000
-    for material in materials:
-        content = material.get('content', '')
-        
-        # For larger PDFs, allocate tokens proportionally
-        if total_pdf_size > max_total_content:
-            # Calculate fair share based on relative size
-            fair_share = int((len(content) / total_pdf_size) * max_total_content)
-            if len(content) > fair_share:
-                content = content[:fair_share] + "... [content truncated]"
-        # For smaller PDFs, allow longer chunks
-        elif len(content) > 2500:  # Increased from 1500
-            content = content[:2500] + "... [content truncated]"
-        
-        material_content += f"--- {material.get('name', 'Unnamed material')} ---\n{content}\n\n"
-    
-    # Create system prompt for Groq API
-    system_prompt = f"""
-    You are Exam Pal, a Gen Z-styled Hinglish-speaking study assistant. Your personality is:
-    - Super helpful but with a funny, mast (cool) tone
-    - You ALWAYS mix Hindi and English words (Hinglish), like using "samajh gaye?" instead of "understand?"
-    - Use very simple words to explain complex topics - ELI5 style (explain like I'm 5)
-    - Use lots of desi Gen Z slang like "bhai", "yaar", "matlab", "ekdum", "scene", "vibe" etc.
-    - Add funny Hindi idioms and filmy references when appropriate
-    - Use emojis generously to show excitement and emotion 🔥😎👌
-    - Keep explanations ultra-short and concise - no lengthy professor vibes
-    - Occasionally throw in some "haina?", "na?", "matlab samjhe?" to check understanding
-    - Use super casual tone like talking to a friend
-    - When appropriate, use examples that are relatable to young students
-    
-    You have access to the following study materials:
-    
-    {material_content}
-    
-    When responding to questions:
-    1. If the answer is in the materials, provide it in a clear, Hinglish way with some humor
-    2. If the answer isn't in the materials, be honest and say you don't have that info in a funny Hinglish way
-    3. For complex topics, break explanations into super simple points with Hinglish examples
-    4. Keep responses under 200 words unless more detail is explicitly requested
-    5. Always start with a catchphrase like "Arre yaar!", "Bro!", "Dekho na", or "Aisa hai" to sound natural
-    
-    DO NOT make up information not found in the materials.
-    """
-    
-    # Prepare messages including chat history
-    messages = [{"role": "system", "content": system_prompt}]
-    
-    # Add chat history (limited to last 10 messages)
-    for entry in chat_history[-10:]:
-        messages.append({"role": entry["role"], "content": entry["content"]})
-    
-    # Add current user message
-    messages.append({"role": "user", "content": message})
+    # Static prefix -> materials -> history -> question, so the prefix is shared across turns
+    with timed('prompt.chat.assemble'):
+        system_prompt = chat_system_prompt(materials, corpus_version)
+        messages = build_chat_messages(system_prompt, chat_history, message)
     
     try:
         response = requests.post(
@@ -292,3 +256,109 @@ def chat_with_materials(materials: List[Dict[str, Any]], message: str, chat_hist
     except Exception as e:
         logging.error(f"Error in chat response: {str(e)}")
         return "Oops, something went wrong on my end. Can you try again with a different question?"
+
+def pack_questions(questions: List[str], prompt_tokens: int) -> List[List[Dict[str, Any]]]:
+    """
+    Pack questions into as few completion calls as the token budget allows
+    
+    Args:
+        questions: Question texts, in order
+        prompt_tokens: Estimated tokens of the shared prompt sent with every call
+        
+    Returns:
+        Groups of question dictionaries with 1-based 'id' and 'question'
+    """
+    groups = []
+    group = []
+    group_tokens = 0
+    
+    for index, question in enumerate(questions, start=1):
+        question_tokens = estimate_tokens(question) + 4
+        completion_tokens = (len(group) + 1) * BATCH_ANSWER_TOKENS
+        fits = completion_tokens <= BATCH_MAX_COMPLETION_TOKENS and \
+            prompt_tokens + group_tokens + question_tokens + completion_tokens <= MODEL_CONTEXT_TOKENS
+        
+        if group and not fits:
+            groups.append(group)
+            group = []
+            group_tokens = 0
+        
+        group.append({'id': index, 'question': question})
+        group_tokens += question_tokens
+    
+    if group:
+        groups.append(group)
+    
+    return groups
+
+def _answer_group(system_prompt: str, group: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Answer one packed group of questions with a single completion call"""
+    fallback = "Sorry, I couldn't answer this one right now. Try asking it again!"
+    answers = {}
+    
+    try:
+        response = requests.post(
+            GROQ_API_URL,
+            headers=HEADERS,
+            json={
+                "model": DEFAULT_MODEL,
+                "messages": build_batch_messages(system_prompt, group),
+                "temperature": 0.8,
+                "max_tokens": len(group) * BATCH_ANSWER_TOKENS,
+                "response_format": {"type": "json_object"}
+            },
+            timeout=60
+        )
+        
+        if response.status_code == 200:
+            content = response.json()["choices"][0]["message"]["content"]
+            for item in json.loads(content).get("answers", []):
+                if isinstance(item, dict) and "answer" in item:
+                    answers[str(item.get("id"))] = str(item["answer"])
+        else:
+            logging.error(f"Groq API error: {response.status_code} - {response.text}")
+    except Exception as e:
+        logging.error(f"Error in batch answers: {str(e)}")
+    
+    return [
+        {
+            'id': q['id'],
+            'question': q['question'],
+            'answer': answers.get(str(q['id']), fallback),
+            'success': str(q['id']) in answers
+        }
+        for q in group
+    ]
+
+def answer_questions_batch(materials: Materials, questions: List[str],
+                           corpus_version: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Answer many practice questions, sharing one materials context
+    
+    The materials prompt is assembled once and questions are packed into as
+    few completion calls as the token budget allows.
+    
+    Args:
+        materials: List of dictionaries containing file info and extracted
+            content, or a function returning it (see get_corpus)
+        questions: Question texts, in order
+        corpus_version: Version of the materials, used to reuse the prompt's materials section
+        
+    Yields:
+        Lists of answer dictionaries ('id', 'question', 'answer', 'success'),
+        one list per completion call, in question order
+    """
+    if not GROQ_API_KEY:
+        message = "Sorry, I can't respond right now because the Groq API key is not set. Please set the GROQ_API_KEY environment variable."
+        yield [
+            {'id': index, 'question': question, 'answer': message, 'success': False}
+            for index, question in enumerate(questions, start=1)
+        ]
+        return
+    
+    with timed('prompt.batch.assemble'):
+        system_prompt = chat_system_prompt(materials, corpus_version)
+        groups = pack_questions(questions, estimate_tokens(system_prompt + BATCH_INSTRUCTIONS))
+    
+    for group in groups:
+        yield _answer_group(system_prompt, group)
@@ -0,0 +1,295 @@
+"""
+Offline bulk ingestion for Exam Pal
+Pre-processes a directory of course materials in a process pool, writing
+into the same upload and extracted-text store the web app reads, so the
+materials are ready without spending any web-worker time on them
+
+Ingestion is idempotent and resumable: files are recognised by content
+hash, so re-running over the same directory only processes what is new
+or was interrupted.
+
+    python -m utils.ingest path/to/course [--workers N] [--dry-run]
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import itertools
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from werkzeug.utils import secure_filename
+
+from config import UPLOAD_FOLDER, PARTIAL_UPLOAD_FOLDER
+from utils.file_processor import (
+    allowed_file, file_sha256, extract_file_pages, process_file,
+    save_extracted_content, load_extracted_content, get_all_uploaded_files, _extracted_record_path
+)
+
+def find_sources(root: str) -> List[str]:
+    """
+    Find ingestible files under a directory
+
+    Args:
+        root: Directory to walk
+
+    Returns:
+        Sorted paths of files with an allowed extension, hidden files skipped
+    """
+    sources = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for filename in filenames:
+            if not filename.startswith('.') and allowed_file(filename):
+                sources.append(os.path.join(dirpath, filename))
+    return sorted(sources)
+
+def scan_store() -> Tuple[Dict[str, str], List[str]]:
+    """
+    Index the content already in the store
+
+    Returns:
+        Tuple of (content hash -> path of the upload holding that content,
+        paths of uploads without a valid extracted record)
+    """
+    known = {}
+    unprocessed = []
+    for file_info in get_all_uploaded_files():
+        if not allowed_file(file_info['name']):
+            continue
+        record = load_extracted_content(file_info['path'])
+        if record is None:
+            # Interrupted or failed extraction; resumed in place
+            unprocessed.append(file_info['path'])
+            digest = file_sha256(file_info['path'])
+        else:
+            # Records written before content hashes were stored are hashed here
+            digest = record.get('sha256') or file_sha256(file_info['path'])
+        known.setdefault(digest, file_info['path'])
+    return known, unprocessed
+
+def _release_claim(upload_path: str, file_info: Dict) -> None:
+    """Remove a record claimed for a name that a web upload took, unless it was already replaced"""
+    record_path = _extracted_record_path(upload_path)
+    try:
+        with open(record_path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        if record.get('sha256') == file_info['sha256'] and record.get('mtime') == file_info['mtime']:
+            os.remove(record_path)
+    except (OSError, ValueError):
+        pass
+
+def _failure_message(failed_pages: List[int], page_count: int) -> str:
+    return f"could not extract {len(failed_pages)} of {page_count} pages"
+
+def ingest_file(source: str, digest: str) -> Dict:
+    """
+    Copy one source file into the store and extract it
+
+    Runs in a pool process. The copy is extracted in PARTIAL_UPLOAD_FOLDER
+    and its record written before the file is linked into UPLOAD_FOLDER, so
+    the web app never sees an upload without its record and never extracts
+    it itself. The temp copy is locked while in use so the storage janitor
+    leaves it alone; an interrupted run leaves at most a temp file for it
+    to clean up. A file with pages that failed to extract (an unreadable
+    PDF, or OCR during a Vision API outage) raises instead of being stored.
+
+    Args:
+        source: Path of the file to ingest
+        digest: Content hash of the file
+
+    Returns:
+        Result dictionary with 'path', 'type', 'pages', 'size' and 'seconds'
+    """
+    start = time.monotonic()
+    filename = os.path.basename(source)
+    ext = os.path.splitext(filename)[1].lower()
+    tmp_path = os.path.join(PARTIAL_UPLOAD_FOLDER, f"ingest-{digest}-{os.getpid()}{ext}")
+    shutil.copyfile(source, tmp_path)
+
+    lock_file = open(tmp_path, 'rb')
+    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+    try:
+        file_type, pages, cleanup, failed_pages = extract_file_pages(tmp_path)
+        if failed_pages:
+            # Nothing is stored, so the file is picked up again next run
+            raise RuntimeError(_failure_message(failed_pages, len(pages)))
+        stat = os.stat(tmp_path)
+
+        base = os.path.splitext(secure_filename(filename))[0]
+        for counter in itertools.count():
+            upload_path = os.path.join(UPLOAD_FOLDER, f"{base}_{counter}{ext}" if counter else f"{base}{ext}")
+            if os.path.exists(upload_path):
+                continue
+            file_info = {
+                'id': os.path.basename(upload_path),
+                'path': upload_path,
+                'name': os.path.basename(upload_path),
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'sha256': digest,
+                'type': file_type
+            }
+
+            # Claim the name through its record first, never replacing a
+            # record that belongs to a web upload; write errors propagate
+            # and fail this file
+            if not save_extracted_content(file_info, pages, cleanup, exclusive=True):
+                continue
+
+            # Linking keeps size and mtime, so the record is valid the moment
+            # the upload appears; it fails instead of overwriting if a web
+            # upload took the same name in the meantime
+            try:
+                os.link(tmp_path, upload_path)
+                break
+            except FileExistsError:
+                _release_claim(upload_path, file_info)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        lock_file.close()
+
+    return {
+        'path': upload_path,
+        'type': file_type,
+        'pages': len(pages),
+        'size': stat.st_size,
+        'seconds': time.monotonic() - start
+    }
+
+def resume_file(upload_path: str) -> Dict:
+    """
+    Extract an upload that is in the store but has no valid record
+
+    Args:
+        upload_path: Path of the upload
+
+    Returns:
+        Result dictionary like ingest_file's
+    """
+    start = time.monotonic()
+    file_info = process_file(upload_path)
+    if file_info['failed_pages']:
+        # The record is stored as stale, so the upload is resumed again next run
+        raise RuntimeError(_failure_message(file_info['failed_pages'], file_info['pages']))
+    return {
+        'path': upload_path,
+        'type': file_info['type'],
+        'pages': file_info['pages'],
+        'size': file_info['size'],
+        'seconds': time.monotonic() - start
+    }
+
+def _hash_source(source: str) -> Tuple[str, str]:
+    return source, file_sha256(source)
+
+def ingest_directory(root: str, workers: Optional[int] = None, dry_run: bool = False) -> Dict:
+    """
+    Ingest every new file under a directory
+
+    Args:
+        root: Directory of course materials
+        workers: Number of pool processes (defaults to the number of CPUs)
+        dry_run: Only report what would be ingested
+
+    Returns:
+        Stats dictionary with counts, bytes, pages, elapsed time and failures
+    """
+    start = time.monotonic()
+    workers = workers or os.cpu_count() or 1
+    stats = {
+        'sources': 0, 'ingested': 0, 'resumed': 0, 'skipped': 0, 'duplicates': 0,
+        'failed': [], 'bytes': 0, 'pages': 0, 'by_type': {}, 'workers': workers, 'dry_run': dry_run
+    }
+
+    sources = find_sources(root)
+    stats['sources'] = len(sources)
+    known, unprocessed = scan_store()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Hash in the pool too; reading hundreds of files is a real cost
+        todo = {}
+        for source, digest in pool.map(_hash_source, sources, chunksize=8):
+            if digest in known:
+                stats['skipped'] += 1
+            elif digest in todo:
+                stats['duplicates'] += 1
+            else:
+                todo[digest] = source
+
+        if dry_run:
+            stats.update({'ingested': len(todo), 'resumed': len(unprocessed)})
+            stats['elapsed'] = time.monotonic() - start
+            return stats
+
+        futures = {pool.submit(resume_file, path): (path, 'resumed') for path in unprocessed}
+        futures.update({pool.submit(ingest_file, source, digest): (source, 'ingested')
+                        for digest, source in todo.items()})
+
+        for done, future in enumerate(as_completed(futures), 1):
+            path, outcome = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Error ingesting {path}: {str(e)}")
+                stats['failed'].append({'path': path, 'error': str(e)})
+                continue
+
+            stats[outcome] += 1
+            stats['bytes'] += result['size']
+            stats['pages'] += result['pages']
+            stats['by_type'][result['type']] = stats['by_type'].get(result['type'], 0) + 1
+            print(f"[{done}/{len(futures)}] {path} -> {result['path']} "
+                  f"({result['pages']} pages, {result['seconds']:.1f}s)", file=sys.stderr)
+
+    stats['elapsed'] = time.monotonic() - start
+    return stats
+
+def format_stats(stats: Dict) -> str:
+    """Human-readable throughput summary"""
+    elapsed = max(stats['elapsed'], 1e-6)
+    files = stats['ingested'] + stats['resumed']
+    lines = [
+        f"Sources found:      {stats['sources']}",
+        f"Ingested:           {stats['ingested']}",
+        f"Resumed:            {stats['resumed']}",
+        f"Already in store:   {stats['skipped']}",
+        f"Duplicate sources:  {stats['duplicates']}",
+        f"Failed:             {len(stats['failed'])}",
+    ]
+    if not stats['dry_run']:
+        lines += [
+            f"Pages extracted:    {stats['pages']}",
+            f"By type:            {', '.join(f'{k}={v}' for k, v in sorted(stats['by_type'].items())) or '-'}",
+            f"Elapsed:            {elapsed:.1f}s with {stats['workers']} workers",
+            f"Throughput:         {files / elapsed:.2f} files/s, {stats['pages'] / elapsed:.2f} pages/s, "
+            f"{stats['bytes'] / elapsed / (1024 * 1024):.2f} MB/s",
+        ]
+    for failure in stats['failed']:
+        lines.append(f"  failed: {failure['path']}: {failure['error']}")
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory of course materials")
+    parser.add_argument('directory', help="directory to walk for PDFs and images")
+    parser.add_argument('--workers', type=int, default=None, help="pool processes (default: all CPUs)")
+    parser.add_argument('--dry-run', action='store_true', help="only report what would be ingested")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"not a directory: {args.directory}")
+
+    logging.basicConfig(level=logging.WARNING)
+    stats = ingest_directory(args.directory, workers=args.workers, dry_run=args.dry_run)
+    print(format_stats(stats))
+    return 1 if stats['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
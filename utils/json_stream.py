@@ -0,0 +1,127 @@
+"""
+Incremental JSON parsing for streamed study plans
+Emits the overview and each milestone as soon as it is complete in the stream
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+class IncrementalPlanParser:
+    """
+    Scans a study plan JSON document as it arrives in pieces
+
+    Only the structure needed to find complete values is tracked: nesting,
+    strings and the current key of each object. Complete values are parsed
+    with json.loads on their slice of the buffer.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.overview: Optional[str] = None
+        self.milestones: List[Dict] = []
+        self._pos = 0
+        self._stack: List[Dict] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._milestone_start: Optional[int] = None
+
+    def _in_milestones(self) -> bool:
+        """Whether the scanner is directly inside the top-level milestones array"""
+        return len(self._stack) >= 2 and self._stack[0]['type'] == '{' and \
+            self._stack[0]['key'] == 'milestones' and self._stack[1]['type'] == '['
+
+    def _on_string(self, raw: str, events: List[Tuple[str, Any]]) -> None:
+        """Handle a complete string token"""
+        top = self._stack[-1] if self._stack else None
+        if top is None or top['type'] != '{':
+            return
+
+        if top['expect'] == 'key':
+            top['key'] = json.loads(raw)
+        elif len(self._stack) == 1 and top['key'] == 'overview':
+            self.overview = json.loads(raw)
+            events.append(('overview', self.overview))
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Add the next piece of the document
+
+        Args:
+            text: Next piece of streamed JSON text
+
+        Returns:
+            List of newly completed (event, value) pairs: ('overview', str)
+            or ('milestone', dict)
+        """
+        self.buffer += text
+        buf = self.buffer
+        events = []
+
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._on_string(buf[self._string_start:i + 1], events)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in '{[':
+                if ch == '{' and len(self._stack) == 2 and self._in_milestones():
+                    self._milestone_start = i
+                self._stack.append({'type': ch, 'expect': 'key', 'key': None})
+            elif ch in '}]':
+                if self._stack:
+                    self._stack.pop()
+                if ch == '}' and self._milestone_start is not None and \
+                        len(self._stack) == 2 and self._in_milestones():
+                    try:
+                        milestone = json.loads(buf[self._milestone_start:i + 1])
+                        self.milestones.append(milestone)
+                        events.append(('milestone', milestone))
+                    except json.JSONDecodeError as e:
+                        logging.warning(f"Skipping malformed milestone: {str(e)}")
+                    self._milestone_start = None
+            elif self._stack and self._stack[-1]['type'] == '{':
+                if ch == ':':
+                    self._stack[-1]['expect'] = 'value'
+                elif ch == ',':
+                    self._stack[-1]['expect'] = 'key'
+
+        self._pos = len(buf)
+        return events
+
+    def result(self) -> Dict:
+        """
+        Parse the complete document
+
+        Returns:
+            The full study plan, or what was recovered incrementally if the
+            document as a whole is not valid JSON
+        """
+        text = self.buffer.strip()
+        if "```json" in text:
+            text = text.split("```json")[1].split("```")[0].strip()
+        elif text.startswith("```"):
+            text = text.split("```")[1].strip()
+
+        try:
+            plan = json.loads(text)
+            if isinstance(plan, dict):
+                return plan
+        except json.JSONDecodeError:
+            logging.warning("Could not parse streamed study plan, returning recovered parts")
+
+        return {
+            'overview': self.overview if self.overview is not None else self.buffer,
+            'milestones': self.milestones
+        }
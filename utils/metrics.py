@@ -0,0 +1,56 @@
+"""
+Lightweight in-process metrics for Exam Pal
+Counters and timings are kept per worker process and exposed via the admin routes
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_timings: Dict[str, Dict[str, float]] = {}
+
+def increment(name: str, value: int = 1) -> None:
+    """Increase a named counter"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def record_timing(name: str, seconds: float) -> None:
+    """Record one duration for a named timing"""
+    with _lock:
+        timing = _timings.setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        ms = seconds * 1000
+        timing['count'] += 1
+        timing['total_ms'] += ms
+        timing['max_ms'] = max(timing['max_ms'], ms)
+
+@contextmanager
+def timed(name: str):
+    """Context manager that records how long its block took"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, time.perf_counter() - start)
+
+def get_metrics() -> Dict:
+    """
+    Get a snapshot of all counters and timings for this process
+
+    Returns:
+        Dictionary with 'pid', 'counters' and 'timings' (count, avg/max/total ms)
+    """
+    with _lock:
+        timings = {
+            name: {
+                'count': t['count'],
+                'avg_ms': round(t['total_ms'] / t['count'], 3) if t['count'] else 0.0,
+                'max_ms': round(t['max_ms'], 3),
+                'total_ms': round(t['total_ms'], 3)
+            }
+            for name, t in _timings.items()
+        }
+        return {'pid': os.getpid(), 'counters': dict(_counters), 'timings': timings}
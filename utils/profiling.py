@@ -0,0 +1,235 @@
+"""
+On-demand request profiling for Exam Pal
+Profiles selected requests with cProfile and a stack sampler, writing
+per-endpoint aggregated profiles and flamegraph-compatible stack dumps
+
+Nothing is installed unless PROFILING_ENABLED is set, so there is no
+per-request overhead when profiling is off. When it is on, a request is
+profiled if it carries an X-Profile header matching ADMIN_TOKEN, or if it
+falls within PROFILE_SAMPLE_RATE.
+"""
+
+import os
+import sys
+import time
+import fcntl
+import hmac
+import random
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+from config import ADMIN_TOKEN, PROFILING_ENABLED, PROFILE_SAMPLE_RATE, PROFILE_FOLDER, PROFILE_KEEP
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+# Per-request profiles are written here; aggregates live directly in PROFILE_FOLDER
+REQUESTS_FOLDER = os.path.join(PROFILE_FOLDER, 'requests')
+
+class StackSampler:
+    """Periodically samples one thread's Python stack into collapsed-stack counts"""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+class ProfileSession:
+    """Profiles one request from the WSGI call until its response is closed"""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident())
+        self.started = time.time()
+
+    def start(self):
+        self.sampler.start()
+        self.profiler.enable()
+
+    def stop(self, endpoint: str):
+        self.profiler.disable()
+        self.sampler.stop()
+        try:
+            save_profile(endpoint, self.profiler, self.sampler.counts, self.started)
+        except Exception as e:
+            logging.error(f"Error saving profile for {endpoint}: {str(e)}")
+
+class _ProfiledResponse:
+    """Wraps a WSGI response so profiling covers streamed bodies too"""
+
+    def __init__(self, result, session: ProfileSession, endpoint: str):
+        self.result = result
+        self.session = session
+        self.endpoint = endpoint
+
+    def __iter__(self):
+        return iter(self.result)
+
+    def close(self):
+        try:
+            if hasattr(self.result, 'close'):
+                self.result.close()
+        finally:
+            self.session.stop(self.endpoint)
+
+class ProfilingMiddleware:
+    """WSGI middleware that profiles selected requests"""
+
+    def __init__(self, app):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+
+    def _should_profile(self, environ: Dict) -> bool:
+        token = environ.get('HTTP_X_PROFILE')
+        if token and ADMIN_TOKEN and hmac.compare_digest(token, ADMIN_TOKEN):
+            return True
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    def _endpoint(self, environ: Dict) -> str:
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+            return endpoint
+        except Exception:
+            return 'unmatched'
+
+    def __call__(self, environ, start_response):
+        # Skip when this thread is already being profiled (e.g. a debugger)
+        if not self._should_profile(environ) or sys.getprofile() is not None:
+            return self.wsgi_app(environ, start_response)
+
+        session = ProfileSession()
+        endpoint = self._endpoint(environ)
+        session.start()
+        try:
+            result = self.wsgi_app(environ, start_response)
+        except Exception:
+            session.stop(endpoint)
+            raise
+        return _ProfiledResponse(result, session, endpoint)
+
+def _merge_folded(path: str, counts: Counter) -> None:
+    """Add collapsed-stack counts into an existing folded file"""
+    merged = Counter()
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack and count.isdigit():
+                    merged[stack] += int(count)
+    merged.update(counts)
+    _write_folded(path, merged)
+
+def _write_folded(path: str, counts: Counter) -> None:
+    """Write collapsed stacks in the format flamegraph.pl and speedscope read"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+
+def save_profile(endpoint: str, profiler: cProfile.Profile, counts: Counter, started: float) -> None:
+    """
+    Write one request's profile and fold it into the endpoint's aggregates
+
+    Args:
+        endpoint: Flask endpoint name of the request
+        profiler: Finished cProfile profiler
+        counts: Collapsed-stack sample counts
+        started: Request start time
+    """
+    os.makedirs(REQUESTS_FOLDER, exist_ok=True)
+    name = endpoint.replace('.', '_')
+
+    # Per-request files, newest kept
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(started))
+    base = os.path.join(REQUESTS_FOLDER, f"{stamp}-{int(started * 1000) % 1000:03d}_{name}_{os.getpid()}")
+    profiler.dump_stats(base + '.prof')
+    _write_folded(base + '.folded', counts)
+
+    # Aggregates are shared by all workers, so merge under a lock
+    aggregate = os.path.join(PROFILE_FOLDER, name)
+    with open(aggregate + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        stats = pstats.Stats(profiler)
+        if os.path.exists(aggregate + '.prof'):
+            stats.add(aggregate + '.prof')
+        stats.dump_stats(aggregate + '.prof')
+        _merge_folded(aggregate + '.folded', counts)
+
+    _prune_requests()
+
+def _prune_requests() -> None:
+    """Keep only the newest PROFILE_KEEP per-request profiles"""
+    entries = sorted(
+        (entry for entry in os.scandir(REQUESTS_FOLDER) if entry.name.endswith('.prof')),
+        key=lambda entry: entry.name,
+        reverse=True
+    )
+    for entry in entries[PROFILE_KEEP:]:
+        for path in (entry.path, entry.path[:-len('.prof')] + '.folded'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def list_profiles() -> list:
+    """
+    List saved profiles, newest first
+
+    Returns:
+        List of dictionaries with 'name' (relative to PROFILE_FOLDER), 'size' and 'modified'
+    """
+    profiles = []
+    for folder in (PROFILE_FOLDER, REQUESTS_FOLDER):
+        if not os.path.isdir(folder):
+            continue
+        for entry in os.scandir(folder):
+            if entry.is_file() and entry.name.endswith(('.prof', '.folded')):
+                stat = entry.stat()
+                profiles.append({
+                    'name': os.path.relpath(entry.path, PROFILE_FOLDER),
+                    'size': stat.st_size,
+                    'modified': stat.st_mtime
+                })
+    return sorted(profiles, key=lambda p: p['modified'], reverse=True)
+
+def init_profiling(app) -> Optional[ProfilingMiddleware]:
+    """
+    Install the profiling middleware if PROFILING_ENABLED is set
+
+    Args:
+        app: The Flask application
+
+    Returns:
+        The installed middleware, or None when profiling is disabled
+    """
+    if not PROFILING_ENABLED:
+        return None
+
+    os.makedirs(REQUESTS_FOLDER, exist_ok=True)
+    middleware = ProfilingMiddleware(app)
+    app.wsgi_app = middleware
+    logging.info(f"Request profiling enabled (sample rate {PROFILE_SAMPLE_RATE})")
+    return middleware
@@ -0,0 +1,275 @@
+"""
+Prompt templates for Exam Pal
+Static prompt text is built once at import; the per-corpus materials
+sections are memoized by corpus version, and the materials themselves are
+only loaded when a section has to be built.
+
+Prompts are laid out as static prefix -> corpus -> history -> question so
+consecutive requests share a byte-identical prefix that upstream prefix
+caching can reuse.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Any, Optional, Union
+
+from utils.metrics import increment
+
+# Chat materials budget (characters)
+CHAT_MAX_TOTAL_CONTENT = 10000
+CHAT_MAX_MATERIAL_CONTENT = 2500
+
+# Study plan materials budget (characters)
+PLAN_MAX_MATERIAL_CONTENT = 2000
+PLAN_MAX_TOTAL_CONTENT = 8000
+
+# Number of memoized materials sections kept per process
+SECTION_CACHE_SIZE = 8
+
+# Materials, or a function loading them (see file_processor.get_corpus)
+Materials = Union[List[Dict[str, Any]], Callable[[], List[Dict[str, Any]]]]
+
+CHAT_SYSTEM_PREFIX = """You are Exam Pal, a Gen Z-styled Hinglish-speaking study assistant. Your personality is:
+- Super helpful but with a funny, mast (cool) tone
+- You ALWAYS mix Hindi and English words (Hinglish), like using "samajh gaye?" instead of "understand?"
+- Use very simple words to explain complex topics - ELI5 style (explain like I'm 5)
+- Use lots of desi Gen Z slang like "bhai", "yaar", "matlab", "ekdum", "scene", "vibe" etc.
+- Add funny Hindi idioms and filmy references when appropriate
+- Use emojis generously to show excitement and emotion 🔥😎👌
+- Keep explanations ultra-short and concise - no lengthy professor vibes
+- Occasionally throw in some "haina?", "na?", "matlab samjhe?" to check understanding
+- Use super casual tone like talking to a friend
+- When appropriate, use examples that are relatable to young students
+
+When responding to questions:
+1. If the answer is in the materials, provide it in a clear, Hinglish way with some humor
+2. If the answer isn't in the materials, be honest and say you don't have that info in a funny Hinglish way
+3. For complex topics, break explanations into super simple points with Hinglish examples
+4. Keep responses under 200 words unless more detail is explicitly requested
+5. Always start with a catchphrase like "Arre yaar!", "Bro!", "Dekho na", or "Aisa hai" to sound natural
+
+DO NOT make up information not found in the materials.
+
+You have access to the following study materials:
+
+"""
+
+STUDY_PLAN_SYSTEM_PROMPT = """You are Exam Pal, an AI study assistant designed to help students prepare for exams effectively.
+Your task is to create a personalized study plan based on the student's uploaded materials,
+their goal, and their exam deadline. The plan should be specific, actionable, and tailored to the content.
+
+The study plan should include:
+1. An overview of the material and key topics to focus on
+2. A timeline with specific milestones and tasks broken down by date
+3. Learning strategies appropriate for the material
+4. Recommended practice exercises or self-assessment methods
+
+IMPORTANT: Identify units, chapters, or major topics in the materials and organize the study plan
+to follow these units in a logical progression. Each milestone should focus on specific units or topics.
+
+Your response should be in JSON format with the following structure:
+{
+    "overview": "General overview and approach",
+    "milestones": [
+        {
+            "date": "YYYY-MM-DD",
+            "title": "Milestone title",
+            "description": "Description of this milestone",
+            "unit": "Unit or topic name this milestone covers",
+            "tasks": ["Task 1", "Task 2", ...]
+        },
+        ...
+    ]
+}
+
+Ensure the milestones are distributed evenly from now until the deadline, and organize them by units or topics when available.
+"""
+
+STUDY_PLAN_USER_PREFIX = "Create a study plan for me based on these materials:\n\n"
+
+STUDY_PLAN_USER_SUFFIX = """My goal is to {goal_description}.
+My exam is in {days_until_deadline} days (on {deadline}).
+
+Please make the plan specific to the content in these materials and provide a realistic schedule.
+"""
+
+GOAL_DESCRIPTIONS = {
+    "pass": "just pass the exam with minimal effort",
+    "good": "get a good grade (B or equivalent)",
+    "ace": "ace the exam (A or equivalent)",
+    "master": "master the material completely for long-term knowledge"
+}
+
+_section_cache: OrderedDict = OrderedDict()
+_section_lock = threading.Lock()
+
+def _resolve(materials: Materials) -> List[Dict[str, Any]]:
+    """Load the materials if they were passed as a loader"""
+    return materials() if callable(materials) else materials
+
+def _memoized_section(kind: str, materials: Materials, corpus_version: Optional[str], build) -> str:
+    """Return a memoized materials section, loading the materials and building it on a miss"""
+    if corpus_version is None:
+        return build(_resolve(materials))
+
+    key = (kind, corpus_version)
+    with _section_lock:
+        if key in _section_cache:
+            _section_cache.move_to_end(key)
+            increment('prompt.section_cache.hit')
+            return _section_cache[key]
+
+    increment('prompt.section_cache.miss')
+    section = build(_resolve(materials))
+
+    with _section_lock:
+        _section_cache[key] = section
+        while len(_section_cache) > SECTION_CACHE_SIZE:
+            _section_cache.popitem(last=False)
+
+    return section
+
+def invalidate_sections() -> None:
+    """Drop all memoized materials sections in this process"""
+    with _section_lock:
+        _section_cache.clear()
+
+def _build_chat_materials(materials: List[Dict[str, Any]]) -> str:
+    """Build the chat materials section, sharing the budget across files"""
+    material_content = ""
+
+    # First count total content size to determine allocation per file
+    total_size = sum(len(material.get('content', '')) for material in materials)
+
+    for material in materials:
+        content = material.get('content', '')
+
+        # For larger corpora, allocate characters proportionally
+        if total_size > CHAT_MAX_TOTAL_CONTENT:
+            fair_share = int((len(content) / total_size) * CHAT_MAX_TOTAL_CONTENT)
+            if len(content) > fair_share:
+                content = content[:fair_share] + "... [content truncated]"
+        # For smaller corpora, allow longer chunks
+        elif len(content) > CHAT_MAX_MATERIAL_CONTENT:
+            content = content[:CHAT_MAX_MATERIAL_CONTENT] + "... [content truncated]"
+
+        material_content += f"--- {material.get('name', 'Unnamed material')} ---\n{content}\n\n"
+
+    return material_content
+
+def _build_study_plan_materials(materials: List[Dict[str, Any]]) -> str:
+    """Build the study plan materials section within its character budget"""
+    material_content = ""
+    for material in materials:
+        content = material.get('content', '')
+        # Limit each material to avoid hitting token limits
+        if len(content) > PLAN_MAX_MATERIAL_CONTENT:
+            content = content[:PLAN_MAX_MATERIAL_CONTENT] + "... [content truncated]"
+
+        material_content += f"--- {material.get('name', 'Unnamed material')} ---\n{content}\n\n"
+
+    # Limit overall content length
+    if len(material_content) > PLAN_MAX_TOTAL_CONTENT:
+        material_content = material_content[:PLAN_MAX_TOTAL_CONTENT] + "... [content truncated]"
+
+    return material_content
+
+def chat_system_prompt(materials: Materials, corpus_version: Optional[str] = None) -> str:
+    """
+    Get the chat system prompt: static persona prefix followed by the materials
+
+    Args:
+        materials: List of dictionaries containing file info and extracted
+            content, or a function returning it, called only on a cache miss
+        corpus_version: Version of the materials, used as the memoization key
+
+    Returns:
+        System prompt text
+    """
+    return _memoized_section(
+        'chat', materials, corpus_version,
+        lambda m: CHAT_SYSTEM_PREFIX + _build_chat_materials(m)
+    )
+
+def build_chat_messages(system_prompt: str, chat_history: List[Dict], message: str,
+                        history_limit: int = 10) -> List[Dict[str, str]]:
+    """
+    Lay out chat messages as system prompt -> history -> question
+
+    Args:
+        system_prompt: Prompt from chat_system_prompt
+        chat_history: Previous chat history
+        message: The user's current message
+        history_limit: Number of history entries to include
+
+    Returns:
+        Messages list for the chat completions API
+    """
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(
+        {"role": entry["role"], "content": entry["content"]}
+        for entry in chat_history[-history_limit:]
+    )
+    messages.append({"role": "user", "content": message})
+    return messages
+
+def study_plan_messages(materials: Materials, goal: str, deadline: str,
+                        days_until_deadline: int, corpus_version: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Build study plan messages as static system prompt -> materials -> request
+
+    Args:
+        materials: List of dictionaries containing file info and extracted
+            content, or a function returning it, called only on a cache miss
+        goal: Study goal selected by the user
+        deadline: Deadline date and time
+        days_until_deadline: Days left until the deadline
+        corpus_version: Version of the materials, used as the memoization key
+
+    Returns:
+        Messages list for the chat completions API
+    """
+    user_prefix = _memoized_section(
+        'study_plan', materials, corpus_version,
+        lambda m: STUDY_PLAN_USER_PREFIX + _build_study_plan_materials(m)
+    )
+    user_suffix = STUDY_PLAN_USER_SUFFIX.format(
+        goal_description=GOAL_DESCRIPTIONS.get(goal, "do well on the exam"),
+        days_until_deadline=days_until_deadline,
+        deadline=deadline
+    )
+
+    return [
+        {"role": "system", "content": STUDY_PLAN_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prefix + user_suffix}
+    ]
+
+BATCH_INSTRUCTIONS = """Answer each of the numbered practice questions below using the study materials.
+Follow your usual style, keeping each answer under 200 words.
+
+Respond ONLY with JSON in this format:
+{"answers": [{"id": 1, "answer": "..."}, {"id": 2, "answer": "..."}]}
+
+Questions:
+"""
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (about four characters per token)"""
+    return len(text) // 4 + 1
+
+def build_batch_messages(system_prompt: str, questions: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    Lay out a batch of questions as system prompt -> numbered questions
+
+    Args:
+        system_prompt: Prompt from chat_system_prompt
+        questions: Dictionaries with 'id' and 'question'
+
+    Returns:
+        Messages list for the chat completions API
+    """
+    numbered = "\n".join(f"{q['id']}. {q['question']}" for q in questions)
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": BATCH_INSTRUCTIONS + numbered}
+    ]
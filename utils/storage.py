@@ -0,0 +1,347 @@
+"""
+Storage lifecycle management for Exam Pal
+Evicts uploads and derived data by last-access TTL and per-namespace quotas,
+and cleans up orphans left behind by failed or abandoned uploads
+
+Run from the command line for a one-off report:
+    python -m utils.storage --dry-run
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+from config import (
+    UPLOAD_FOLDER, EXTRACTED_FOLDER, PARTIAL_UPLOAD_FOLDER, OCR_CACHE_FOLDER, ADMISSION_STATE_FOLDER,
+    JANITOR_INTERVAL, JANITOR_LOCK_FILE, STORAGE_GRACE_PERIOD, STORAGE_TTLS, STORAGE_QUOTAS
+)
+
+# Minimum seconds between access-time updates for the same file in one process
+ACCESS_TOUCH_INTERVAL = 10 * 60
+
+_last_touched: Dict[str, float] = {}
+_touch_lock = threading.Lock()
+
+def touch_access(path: str) -> None:
+    """
+    Record that a file was just used, for last-access TTLs
+
+    Only the access time is updated; the modification time is left alone
+    because extracted records are validated against it. Updates are
+    throttled per process so hot files don't cost a syscall per request.
+
+    Args:
+        path: Path of the file that was accessed
+    """
+    now = time.time()
+    with _touch_lock:
+        if now - _last_touched.get(path, 0) < ACCESS_TOUCH_INTERVAL:
+            return
+        _last_touched[path] = now
+
+    try:
+        os.utime(path, (now, os.stat(path).st_mtime))
+    except OSError:
+        pass
+
+def last_access(stat: os.stat_result) -> float:
+    """Last access time of a file, falling back to mtime on noatime mounts"""
+    return max(stat.st_atime, stat.st_mtime)
+
+def _entry(path: str, size: int, accessed: float, related: Optional[List[str]] = None) -> Dict:
+    """Describe one evictable item: a file plus any files derived from it"""
+    return {'path': path, 'size': size, 'accessed': accessed, 'related': related or []}
+
+def _scan_uploads() -> List[Dict]:
+    """Uploaded files, each counted together with its extracted-text record"""
+    entries = []
+    for name in os.listdir(UPLOAD_FOLDER):
+        path = os.path.join(UPLOAD_FOLDER, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if not os.path.isfile(path):
+            continue
+
+        record_path = os.path.join(EXTRACTED_FOLDER, name + '.json')
+        size = stat.st_size
+        try:
+            size += os.path.getsize(record_path)
+        except OSError:
+            pass
+
+        entries.append(_entry(path, size, last_access(stat), [record_path]))
+    return entries
+
+def _scan_ocr_cache() -> List[Dict]:
+    """Cached OCR page texts"""
+    entries = []
+    for name in os.listdir(OCR_CACHE_FOLDER):
+        path = os.path.join(OCR_CACHE_FOLDER, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append(_entry(path, stat.st_size, last_access(stat)))
+    return entries
+
+def _scan_admission_sessions() -> List[Dict]:
+    """Per-session admission control state"""
+    folder = os.path.join(ADMISSION_STATE_FOLDER, 'sessions')
+    entries = []
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append(_entry(path, stat.st_size, stat.st_mtime))
+    return entries
+
+def _scan_partial_uploads() -> List[Dict]:
+    """In-progress chunked uploads, grouped by upload id"""
+    uploads: Dict[str, Dict] = {}
+    for name in os.listdir(PARTIAL_UPLOAD_FOLDER):
+        path = os.path.join(PARTIAL_UPLOAD_FOLDER, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+
+        upload_id = name.split('.', 1)[0]
+        entry = uploads.setdefault(upload_id, _entry(None, 0, 0))
+        if name.endswith('.part'):
+            entry['path'] = path
+        else:
+            entry['related'].append(path)
+        entry['size'] += stat.st_size
+        entry['accessed'] = max(entry['accessed'], stat.st_mtime)
+
+    entries = []
+    for upload_id, entry in uploads.items():
+        # Metadata without data (or the reverse) is an orphan from a failed upload
+        if entry['path'] is None:
+            entry['path'], entry['related'] = entry['related'][0], entry['related'][1:]
+            entry['orphan'] = True
+        elif not entry['related']:
+            entry['orphan'] = True
+        entries.append(entry)
+    return entries
+
+def _scan_extracted_orphans() -> List[Dict]:
+    """Extracted records and temp files whose upload no longer exists"""
+    entries = []
+    for name in os.listdir(EXTRACTED_FOLDER):
+        path = os.path.join(EXTRACTED_FOLDER, name)
+        upload_name = name[:-len('.json')] if name.endswith('.json') else None
+        if upload_name and os.path.exists(os.path.join(UPLOAD_FOLDER, upload_name)):
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append(_entry(path, stat.st_size, stat.st_mtime))
+    return entries
+
+NAMESPACES = {
+    'uploads': _scan_uploads,
+    'ocr_cache': _scan_ocr_cache,
+    'partial_uploads': _scan_partial_uploads,
+    'admission_sessions': _scan_admission_sessions
+}
+
+def _is_locked(path: str) -> bool:
+    """Whether another request currently holds the file's lock (e.g. a chunk being written)"""
+    try:
+        with open(path, 'rb') as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    except OSError:
+        pass
+    return False
+
+def _remove(entry: Dict) -> int:
+    """Delete an entry and its related files, tolerating concurrent deletes"""
+    freed = 0
+    for path in [entry['path']] + entry['related']:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            freed += size
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Error removing {path}: {str(e)}")
+    return freed
+
+def plan_evictions(namespace: str, entries: List[Dict], now: float) -> List[Dict]:
+    """
+    Decide which entries of a namespace to evict
+
+    Orphans and entries past their TTL go first; then the least recently
+    used entries are evicted until the namespace fits its quota. Entries
+    used within STORAGE_GRACE_PERIOD are never evicted.
+
+    Args:
+        namespace: Name of the namespace, for its TTL and quota
+        entries: Entries from the namespace scanner
+        now: Current time
+
+    Returns:
+        Entries to evict, each with a 'reason'
+    """
+    ttl = STORAGE_TTLS.get(namespace)
+    quota = STORAGE_QUOTAS.get(namespace)
+    evict = []
+    kept = []
+
+    for entry in entries:
+        age = now - entry['accessed']
+        if age < STORAGE_GRACE_PERIOD:
+            kept.append(entry)
+        elif entry.get('orphan'):
+            evict.append({**entry, 'reason': 'orphan'})
+        elif ttl is not None and age > ttl:
+            evict.append({**entry, 'reason': 'ttl'})
+        else:
+            kept.append(entry)
+
+    if quota is not None:
+        used = sum(entry['size'] for entry in kept)
+        for entry in sorted(kept, key=lambda e: e['accessed']):
+            if used <= quota:
+                break
+            if now - entry['accessed'] < STORAGE_GRACE_PERIOD:
+                continue
+            evict.append({**entry, 'reason': 'quota'})
+            used -= entry['size']
+
+    return evict
+
+def run_janitor(dry_run: bool = False) -> Dict:
+    """
+    Apply TTLs, quotas and orphan cleanup to every storage namespace
+
+    Safe to run while requests are being served: files are deleted
+    individually and readers treat a vanished file as never uploaded.
+    Partial uploads that are being written are skipped.
+
+    Args:
+        dry_run: Only report what would be removed
+
+    Returns:
+        Report per namespace with bytes used, bytes freed and removed files
+    """
+    now = time.time()
+    report = {'dry_run': dry_run, 'started': now, 'namespaces': {}}
+
+    scans = {name: scanner() for name, scanner in NAMESPACES.items()}
+    scans['extracted'] = _scan_extracted_orphans()
+    for entry in scans['extracted']:
+        entry['orphan'] = True
+
+    for namespace, entries in scans.items():
+        evictions = plan_evictions(namespace, entries, now)
+        freed = 0
+        removed = []
+
+        for entry in evictions:
+            if namespace == 'partial_uploads' and _is_locked(entry['path']):
+                continue
+            if not dry_run:
+                freed += _remove(entry)
+            else:
+                freed += entry['size']
+            removed.append({'path': entry['path'], 'size': entry['size'], 'reason': entry['reason']})
+
+        report['namespaces'][namespace] = {
+            'files': len(entries),
+            'bytes': sum(entry['size'] for entry in entries),
+            'quota': STORAGE_QUOTAS.get(namespace),
+            'ttl': STORAGE_TTLS.get(namespace),
+            'bytes_freed': freed,
+            'removed': removed
+        }
+
+    if not dry_run:
+        removed_count = sum(len(ns['removed']) for ns in report['namespaces'].values())
+        if removed_count:
+            logging.info(f"Storage janitor removed {removed_count} item(s)")
+
+    return report
+
+def run_janitor_once_per_interval() -> Optional[Dict]:
+    """
+    Run the janitor unless another worker is running it or ran it recently
+
+    A non-blocking file lock makes runs exclusive across gunicorn workers,
+    and the lock file's mtime records when the last run finished.
+
+    Returns:
+        The janitor report, or None if the run was skipped
+    """
+    with open(JANITOR_LOCK_FILE, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+
+        try:
+            if time.time() - os.fstat(lock_file.fileno()).st_mtime < JANITOR_INTERVAL and \
+               os.fstat(lock_file.fileno()).st_size > 0:
+                return None
+
+            report = run_janitor()
+
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(json.dumps({'pid': os.getpid(), 'finished': time.time()}))
+            lock_file.flush()
+            return report
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def start_janitor() -> Optional[threading.Thread]:
+    """
+    Start the background janitor thread for this worker process
+
+    Returns:
+        The started thread, or None if JANITOR_INTERVAL disables it
+    """
+    if JANITOR_INTERVAL <= 0:
+        return None
+
+    def loop():
+        while True:
+            try:
+                run_janitor_once_per_interval()
+            except Exception as e:
+                logging.error(f"Storage janitor failed: {str(e)}")
+            time.sleep(JANITOR_INTERVAL)
+
+    thread = threading.Thread(target=loop, name='storage-janitor', daemon=True)
+    thread.start()
+    return thread
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Apply storage TTLs, quotas and orphan cleanup")
+    parser.add_argument('--dry-run', action='store_true', help="only report what would be removed")
+    args = parser.parse_args(argv)
+
+    json.dump(run_janitor(dry_run=args.dry_run), sys.stdout, indent=2)
+    print()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Text cleanup utilities for Exam Pal
+Normalizes extracted text so prompts carry more real content per token
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Only this many lines at the top and bottom of a page are header/footer candidates
+EDGE_LINES = 2
+
+# A line is a running header/footer if it appears on at least this share of pages
+REPEAT_THRESHOLD = 0.5
+
+# Running headers/footers are only detected in documents with at least this many pages
+MIN_PAGES_FOR_REPEATS = 3
+
+PAGE_NUMBER_PATTERN = re.compile(r'^(?P<prefix>page\s*)?(?P<number>\d{1,4})(\s*(?P<sep>of|/)\s*\d{1,4})?$',
+                                 re.IGNORECASE)
+HYPHENATION_PATTERN = re.compile(r'(\w+)-\n[ \t]*([a-z]\w*)')
+WORD_PATTERN = re.compile(r'[^\W\d_]+')
+JUNK_PATTERN = re.compile(r'\(cid:\d+\)|[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\ufffd\u200b-\u200d\ufeff]')
+SPACES_PATTERN = re.compile(r'[ \t\xa0]+')
+BLANK_LINES_PATTERN = re.compile(r'\n{3,}')
+DIGITS_PATTERN = re.compile(r'\d+')
+INLINE_PAGE_NUMBER_PATTERN = re.compile(r'\b(?P<prefix>page\s*)\d{1,4}\b')
+
+def _line_key(line: str, page_index: int, offsets: set) -> str:
+    """
+    Normalize a line so running headers with changing page numbers compare equal
+
+    Only page numbers are normalized: a number after 'page', or one that
+    follows the page order with an offset found by find_page_numbers. A
+    line with any other number ('Question 3', 'marks 5') is content, not a
+    running header, and gets no key.
+
+    Args:
+        line: Line of text
+        page_index: Index of the page the line is on
+        offsets: Offsets between page numbers and page indexes
+
+    Returns:
+        The normalized key, or '' if the line can't be a running header
+    """
+    key = SPACES_PATTERN.sub(' ', line.strip().lower())
+    key = INLINE_PAGE_NUMBER_PATTERN.sub(lambda match: match.group('prefix') + '#', key)
+    key = DIGITS_PATTERN.sub(lambda match: '#' if int(match.group()) - page_index in offsets else match.group(), key)
+    return '' if DIGITS_PATTERN.search(key) else key
+
+def _edge_indexes(lines: List[str]) -> set:
+    """Indexes of the non-empty lines at the top and bottom of a page"""
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    return set(content[:EDGE_LINES] + content[-EDGE_LINES:])
+
+def find_repeated_lines(pages: List[List[str]], offsets: set = frozenset()) -> set:
+    """
+    Find header/footer lines that repeat across pages
+
+    Args:
+        pages: Lines of each page
+        offsets: Page number offsets from find_page_numbers, so headers
+            that include the page number are recognised
+
+    Returns:
+        Set of normalized line keys to drop
+    """
+    if len(pages) < MIN_PAGES_FOR_REPEATS:
+        return set()
+
+    counts = Counter()
+    for page_index, lines in enumerate(pages):
+        # Page numbers are left to find_page_numbers
+        counts.update({_line_key(lines[i], page_index, offsets) for i in _edge_indexes(lines)
+                       if not PAGE_NUMBER_PATTERN.match(lines[i].strip())})
+
+    min_pages = max(2, int(len(pages) * REPEAT_THRESHOLD))
+    return {key for key, count in counts.items() if key and count >= min_pages}
+
+def find_page_numbers(pages: List[List[str]]) -> Tuple[set, set]:
+    """
+    Find page-number lines at the top and bottom of pages
+
+    'Page 3' and '3 of 10' are always page numbers. A bare number is only
+    one when the page numbers of enough pages follow the page order with
+    the same offset, so a year or table value that happens to end a page
+    is kept.
+
+    Args:
+        pages: Lines of each page
+
+    Returns:
+        Tuple of (set of (page index, line index) pairs to drop, offsets
+        between page numbers and page indexes shared by enough pages)
+    """
+    found = set()
+    candidates = []
+    numbered = set()
+    for page_index, lines in enumerate(pages):
+        for i in _edge_indexes(lines):
+            match = PAGE_NUMBER_PATTERN.match(SPACES_PATTERN.sub(' ', lines[i]).strip())
+            if not match:
+                continue
+            numbered.add((page_index, int(match.group('number')) - page_index))
+            if match.group('prefix') or (match.group('sep') or '').lower() == 'of':
+                found.add((page_index, i))
+            else:
+                candidates.append((page_index, i, int(match.group('number')) - page_index))
+
+    # Count each offset once per page
+    offsets = Counter(offset for _, offset in numbered)
+    min_pages = max(2, int(len(pages) * REPEAT_THRESHOLD))
+    sequential = {offset for offset, count in offsets.items() if count >= min_pages}
+
+    found.update((page_index, i) for page_index, i, offset in candidates if offset in sequential)
+    return found, sequential
+
+def _join_hyphenation(match: re.Match, vocabulary: set) -> Tuple[str, bool]:
+    """
+    Rejoin a word split across a line break
+
+    The hyphen is kept for real compounds ('well-known'): when the first
+    part is a word of its own in the document and the joined form is not.
+
+    Returns:
+        Tuple of (replacement text, whether the parts were joined into one word)
+    """
+    first, second = match.group(1), match.group(2)
+    joined = first + second
+    if joined.lower() not in vocabulary and first.lower() in vocabulary:
+        return f"{first}-{second}", False
+    return joined, True
+
+def clean_pages(pages: List[str]) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Clean extracted page texts before they are stored and used in prompts
+
+    Drops running headers/footers and page numbers at the top and bottom
+    of pages, joins words hyphenated across line breaks, strips extraction
+    junk and collapses whitespace. Numbers in the body of a page are kept.
+
+    Args:
+        pages: Extracted text, one entry per page
+
+    Returns:
+        Tuple of (cleaned pages, stats about what was removed)
+    """
+    stats = {
+        'chars_before': sum(len(page) for page in pages),
+        'chars_after': 0,
+        'repeated_lines_removed': 0,
+        'page_numbers_removed': 0,
+        'hyphenations_joined': 0
+    }
+
+    split_pages = [JUNK_PATTERN.sub('', page).splitlines() for page in pages]
+    page_numbers, offsets = find_page_numbers(split_pages)
+    repeated = find_repeated_lines(split_pages, offsets)
+    vocabulary = {word.lower() for lines in split_pages for line in lines for word in WORD_PATTERN.findall(line)}
+
+    cleaned = []
+    for page_index, lines in enumerate(split_pages):
+        edges = _edge_indexes(lines)
+        kept = []
+        for i, line in enumerate(lines):
+            stripped = SPACES_PATTERN.sub(' ', line).strip()
+
+            if i in edges and _line_key(line, page_index, offsets) in repeated:
+                stats['repeated_lines_removed'] += 1
+                continue
+
+            if (page_index, i) in page_numbers:
+                stats['page_numbers_removed'] += 1
+                continue
+
+            kept.append(stripped)
+
+        text = '\n'.join(kept)
+
+        def join(match):
+            replacement, joined = _join_hyphenation(match, vocabulary)
+            stats['hyphenations_joined'] += joined
+            return replacement
+
+        text = HYPHENATION_PATTERN.sub(join, text)
+        text = BLANK_LINES_PATTERN.sub('\n\n', text).strip()
+
+        cleaned.append(text)
+
+    stats['chars_after'] = sum(len(page) for page in cleaned)
+
+    return cleaned, stats